@@ -0,0 +1,131 @@
+"""
+Scaling benchmark of the package on synthetic LV grids.
+
+For every size tier a grid with profiles is generated with a fixed seed, and the wall time of
+graph construction, downstream and alternative edge queries, the time-series power flow,
+the aggregation tables, the N-1 sweep and the EV studies is measured.
+The results are written as JSON lines, one record per tier and phase, so runs of different
+versions can be compared.
+
+Usage:
+
+    python benchmarks/benchmark_scaling.py --tiers small medium --output benchmark_results.jsonl
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from importlib.metadata import PackageNotFoundError, version
+from typing import Callable, Dict, List
+
+from power_system_simulation.grid_analytic import GridAnalysis, graph_creator
+from power_system_simulation.grid_generator import write_lv_grid
+from power_system_simulation.power_grid_modelling import PowerGridModelling
+
+TIERS = {
+    "small": {"n_feeders": 4, "nodes_per_feeder": 10, "n_timestamps": 96, "n_open_points": 2},
+    "medium": {"n_feeders": 8, "nodes_per_feeder": 50, "n_timestamps": 96 * 7, "n_open_points": 8},
+    "large": {"n_feeders": 16, "nodes_per_feeder": 200, "n_timestamps": 96 * 30, "n_open_points": 32},
+}
+
+
+def _timed(function: Callable, repeat: int) -> float:
+    """
+    Best wall time in seconds of repeat calls
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _code_version() -> Dict[str, str]:
+    try:
+        package_version = version("power-system-simulation")
+    except PackageNotFoundError:
+        package_version = "unknown"
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {"package_version": package_version, "commit": commit, "python": platform.python_version()}
+
+
+def benchmark_tier(tier: str, directory: str, seed: int, repeat: int) -> List[Dict[str, object]]:
+    """
+    Generate the grid of a tier and time every phase
+    """
+    size = TIERS[tier]
+    paths = write_lv_grid(directory=directory, seed=seed, **size)
+    with open(paths["meta_data"], encoding="utf-8") as file:
+        feeder_ids = json.load(file)["lv_feeders"]
+    data = [paths["data"], paths["active_load_profile"], paths["reactive_load_profile"], paths["ev_pool"]]
+    analysis = GridAnalysis(data=data, feeder_ids=feeder_ids)
+    grid = analysis.grid
+    line_ids = analysis.input_data["line"]["id"][analysis.input_data["line"]["to_status"] == 1].tolist()
+    modelling = PowerGridModelling(
+        analysis.input_data, analysis.active_load_profile, analysis.reactive_load_profile, trusted=True
+    )
+    phases = {
+        "grid_analysis_construction": lambda: GridAnalysis(data=data, feeder_ids=feeder_ids),
+        "graph_construction": lambda: graph_creator(analysis.input_data),
+        "downstream_vertices": lambda: [grid.find_downstream_vertices(line_id) for line_id in line_ids],
+        "alternative_edges": lambda: [grid.find_alternative_edges(line_id) for line_id in line_ids],
+        "all_alternative_edges": grid.find_all_alternative_edges,
+        "time_series_power_flow": lambda: PowerGridModelling(
+            analysis.input_data, analysis.active_load_profile, analysis.reactive_load_profile, trusted=True
+        ),
+        "aggregation": lambda: (modelling.data_per_timestamp(), modelling.data_per_line()),
+        "contingency_sweep": analysis.contingency_sweep,
+        "ev_penetration_level": lambda: GridAnalysis(data=data, feeder_ids=feeder_ids).ev_penetration_level(0.2),
+        "ev_penetration_monte_carlo": lambda: analysis.ev_penetration_monte_carlo(0.2, n_samples=10, seed=seed),
+    }
+    sizes = {
+        "nodes": len(analysis.input_data["node"]),
+        "lines": len(analysis.input_data["line"]),
+        "sym_loads": len(analysis.input_data["sym_load"]),
+        "timestamps": len(analysis.active_load_profile.index),
+    }
+    records = []
+    for phase, function in phases.items():
+        record = {"tier": tier, "phase": phase, **sizes}
+        # a failing phase (e.g. out of memory) is recorded instead of aborting the other phases
+        try:
+            record["seconds"] = _timed(function, repeat)
+        except (MemoryError, ValueError) as error:
+            record["seconds"] = None
+            record["error"] = f"{type(error).__name__}: {error}"[:200]
+        records.append(record)
+    return records
+
+
+def main() -> None:
+    """
+    Run the benchmark tiers and write the results as JSON lines
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["small", "medium"])
+    parser.add_argument("--output", default="benchmark_results.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    code_version = _code_version()
+    with open(args.output, "a", encoding="utf-8") as output:
+        for tier in args.tiers:
+            with tempfile.TemporaryDirectory() as directory:
+                for record in benchmark_tier(tier=tier, directory=directory, seed=args.seed, repeat=args.repeat):
+                    record.update(code_version)
+                    output.write(json.dumps(record) + "\n")
+                    seconds = "failed" if record["seconds"] is None else f"{record['seconds']:.4f} s"
+                    print(f"{record['tier']:>8} {record['phase']:<28} {seconds:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+This module runs the `GridAnalysis` studies on a fleet of LV grids.
+
+Every grid is a directory with the files of the test data (see `GRID_FILES`), the LV feeders are
+read from its meta_data.json. The grids are analysed in worker processes, one process per grid,
+and every grid writes its result tables into one partitioned parquet dataset per table:
+<output>/<table>/grid_id=<grid>/. A failing grid, or a grid whose worker process dies,
+is reported in the status table, its partitions of an earlier run are removed,
+and it does not stop the other grids.
+"""
+
+# pylint: disable=line-too-long,too-many-arguments,too-many-locals
+import json
+import os
+import shutil
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from power_system_simulation.grid_analytic import GridAnalysis
+
+# file names of a grid directory, like the test data and `write_lv_grid`
+GRID_FILES = {
+    "data": "input_network_data.json",
+    "meta_data": "meta_data.json",
+    "active_load_profile": "active_power_profile.parquet",
+    "reactive_load_profile": "reactive_power_profile.parquet",
+    "ev_pool": "ev_active_power_profile.parquet",
+}
+
+# studies of GridAnalysis which can be run on a fleet, with the table names of studies returning two tables
+STUDIES = {
+    "alternative_grid_topology": None,
+    "contingency_sweep": None,
+    "optimal_tap_position": None,
+    "ev_penetration_level": ("per_timestamp", "per_line"),
+    "ev_penetration_monte_carlo": ("per_line", "per_node"),
+    "ev_penetration_sweep": None,
+    "hosting_capacity": None,
+}
+
+# directory in the output directory where the tables of a grid are written before they are moved into place
+STAGING_DIRECTORY = ".staging"
+
+
+class InvalidManifestError(Exception):
+    """
+    Manifest of grids is invalid
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
+class InvalidStudyError(Exception):
+    """
+    Study is not supported in fleet mode
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
+def check_grid_id(grid_id: str) -> None:
+    """
+    Grid IDs name the partition directories grid_id=<grid>, so they cannot contain path separators or =
+    """
+    if not grid_id or grid_id.startswith(".") or any(character in grid_id for character in "/\\="):
+        raise InvalidManifestError(f"Grid ID {grid_id!r} should not be empty, start with . or contain /, \\ or =.")
+
+
+def _grid_paths(directory: Path, files: Dict[str, str] | None = None) -> Dict[str, str]:
+    """
+    Paths of the files of a grid directory, with optional other file names per file
+    """
+    names = {**GRID_FILES, **(files or {})}
+    return {file: str(directory / name) for file, name in names.items()}
+
+
+def discover_grids(directory: str) -> Dict[str, Dict[str, str]]:
+    """
+    The grids in the (not hidden) subdirectories of directory which contain a meta_data.json,
+    by grid ID (the name of the subdirectory) in sorted order, with the paths of their files
+    """
+    return {
+        path.name: _grid_paths(path)
+        for path in sorted(Path(directory).iterdir())
+        if path.is_dir() and not path.name.startswith(".") and (path / GRID_FILES["meta_data"]).is_file()
+    }
+
+
+def read_manifest(path: str) -> Dict[str, Dict[str, str]]:
+    """
+    The grids listed in a JSON manifest, by grid ID with the paths of their files.
+    The manifest is a list of grids, each with:
+    * directory: the grid directory, relative to the manifest
+    * grid_id (optional): the ID of the grid, by default the name of the directory
+    * other file names per file of `GRID_FILES` (optional)
+    """
+    manifest_path = Path(path)
+    with open(manifest_path, encoding="utf-8") as file:
+        entries = json.load(file)
+    grids = {}
+    for entry in entries:
+        if "directory" not in entry:
+            raise InvalidManifestError("Every grid in the manifest should have a directory.")
+        directory = manifest_path.parent / entry["directory"]
+        grid_id = str(entry.get("grid_id", directory.name))
+        check_grid_id(grid_id)
+        if grid_id in grids:
+            raise InvalidManifestError("Grid IDs in the manifest should be unique.")
+        files = {file: name for file, name in entry.items() if file in GRID_FILES}
+        grids[grid_id] = _grid_paths(directory, files)
+    return grids
+
+
+def _study_tables(study: str, result) -> Dict[str, pd.DataFrame]:
+    """
+    Result tables of a study by table name, with the index as column.
+    A single value (tap position, hosting capacity) becomes a table with one row.
+    """
+    if STUDIES[study] is not None:
+        tables = {f"{study}_{suffix}": table for suffix, table in zip(STUDIES[study], result)}
+    elif isinstance(result, pd.DataFrame):
+        tables = {study: result}
+    else:
+        tables = {study: pd.DataFrame({study: [result]})}
+    return {name: table.reset_index(drop=table.index.name is None) for name, table in tables.items()}
+
+
+def _partition(output_directory: str, table: str, grid_id: str) -> Path:
+    return Path(output_directory) / table / f"grid_id={grid_id}"
+
+
+def remove_partitions(output_directory: str, grid_id: str) -> None:
+    """
+    Remove the partitions of one grid from every dataset in the output directory
+    """
+    for table in Path(output_directory).iterdir():
+        partition = table / f"grid_id={grid_id}"
+        if partition.is_dir():
+            shutil.rmtree(partition, ignore_errors=True)
+
+
+def write_partitions(output_directory: str, grid_id: str, tables: Dict[str, pd.DataFrame]) -> Dict[str, str]:
+    """
+    Write the tables of one grid as partitions grid_id=<grid> of the parquet datasets of the tables,
+    replacing the partitions of an earlier run. Return the path of the written file per table.
+    All tables are written to a staging directory first and only moved into place once all of them
+    are written, so readers never see a partly written file and a failing write leaves the earlier run.
+    """
+    staging = Path(output_directory) / STAGING_DIRECTORY / f"{grid_id}-{uuid.uuid4().hex[:12]}"
+    try:
+        for table, data in tables.items():
+            (staging / table).mkdir(parents=True)
+            data.to_parquet(staging / table / "part-0.parquet", index=False)
+        paths = {}
+        for table in tables:
+            partition = _partition(output_directory, table, grid_id)
+            partition.parent.mkdir(parents=True, exist_ok=True)
+            if partition.exists():
+                # a directory cannot be replaced by a rename, the earlier partition is moved aside first
+                os.replace(partition, staging / f"{table}.previous")
+            os.replace(staging / table, partition)
+            paths[table] = str(partition / "part-0.parquet")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return paths
+
+
+def run_grid(
+    grid_id: str,
+    paths: Dict[str, str],
+    studies: Dict[str, Dict[str, object]],
+    output_directory: str,
+    analysis_options: Dict[str, object] | None = None,
+) -> Dict[str, int]:
+    """
+    Run the studies on one grid and write their tables, only once all studies succeeded.
+    Return the number of rows per written table.
+    """
+    with open(paths["meta_data"], encoding="utf-8") as file:
+        meta_data = json.load(file)
+    analysis = GridAnalysis(
+        data=[paths["data"], paths["active_load_profile"], paths["reactive_load_profile"], paths["ev_pool"]],
+        feeder_ids=meta_data["lv_feeders"],
+        **(analysis_options or {}),
+    )
+    tables = {}
+    try:
+        for study, arguments in studies.items():
+            tables.update(_study_tables(study, getattr(analysis, study)(**arguments)))
+    finally:
+        analysis.close()
+    write_partitions(output_directory, grid_id, tables)
+    return {table: len(data) for table, data in tables.items()}
+
+
+def _run_grid_safely(
+    grid_id: str,
+    paths: Dict[str, str],
+    studies: Dict[str, Dict[str, object]],
+    output_directory: str,
+    analysis_options: Dict[str, object] | None,
+) -> Dict[str, object]:
+    """
+    Status record of running the studies on one grid, the error is caught and recorded
+    """
+    start = time.perf_counter()
+    try:
+        rows = run_grid(grid_id, paths, studies, output_directory, analysis_options)
+        status = {"status": "ok", "error": None, "rows": sum(rows.values())}
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        # a bad grid is reported without results, the fleet continues
+        remove_partitions(output_directory, grid_id)
+        status = {"status": "failed", "error": "".join(traceback.format_exception_only(error)).strip(), "rows": 0}
+    return {"grid_id": grid_id, **status, "seconds": time.perf_counter() - start}
+
+
+def _failed_record(grid_id: str, error: Exception) -> Dict[str, object]:
+    return {"grid_id": grid_id, "status": "failed", "error": repr(error), "rows": 0, "seconds": float("nan")}
+
+
+def _run_in_processes(
+    grids: Dict[str, Dict[str, str]],
+    studies: Dict[str, Dict[str, object]],
+    output_directory: str,
+    analysis_options: Dict[str, object] | None,
+    *,
+    processes: int,
+    finished: Callable[[Dict[str, object]], None],
+) -> None:
+    """
+    Run the grids in at most processes worker processes at a time, one worker process per grid,
+    and pass the status record of every grid to finished
+    """
+    queue = iter(grids.items())
+    running: Dict[Future, tuple[str, ProcessPoolExecutor]] = {}
+
+    def submit() -> None:
+        grid_id, paths = next(queue, (None, None))
+        if grid_id is not None:
+            # a dying worker breaks its executor and every grid in it, so each grid has its own
+            executor = ProcessPoolExecutor(max_workers=1)
+            future = executor.submit(_run_grid_safely, grid_id, paths, studies, output_directory, analysis_options)
+            running[future] = (grid_id, executor)
+
+    try:
+        for _ in range(processes):
+            submit()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                grid_id, executor = running.pop(future)
+                executor.shutdown()
+                try:
+                    record = future.result()
+                except BrokenProcessPool as error:
+                    # the worker process of this grid died, e.g. out of memory
+                    remove_partitions(output_directory, grid_id)
+                    record = _failed_record(grid_id, error)
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    # e.g. the status record could not be sent back
+                    remove_partitions(output_directory, grid_id)
+                    record = _failed_record(grid_id, error)
+                finished(record)
+                submit()
+    finally:
+        for _, executor in running.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_fleet(
+    grids: str | Dict[str, Dict[str, str]],
+    studies: Dict[str, Dict[str, object]],
+    output_directory: str,
+    *,
+    processes: int | None = None,
+    analysis_options: Dict[str, object] | None = None,
+    progress: Callable[[Dict[str, object], int, int], None] | None = None,
+) -> pd.DataFrame:
+    """
+    Run the studies on every grid of a fleet, input:
+    * The grids: a directory of grid directories (see `discover_grids`), a JSON manifest
+        (see `read_manifest`) or the paths of the grid files by grid ID.
+    * The studies: the names of `GridAnalysis` studies (see `STUDIES`) with their keyword arguments,
+        e.g. {"optimal_tap_position": {}, "ev_penetration_level": {"penetration_level": 0.2}}.
+    * The output directory of the parquet datasets, one per result table, partitioned by grid_id.
+    * The number of worker processes running grids concurrently, by default the grids run one by one
+        in the current process. Every grid gets its own worker process, so a worker which dies
+        (e.g. out of memory) only fails the grid it was running.
+    * The keyword arguments of every `GridAnalysis`, e.g. the calculation method.
+    * A progress callback, called with the status record of every finished grid
+        and the number of finished and total grids.
+    Return the status table with one row per grid (grid_id, status ok or failed, error, rows, seconds),
+    which is also written to fleet_status.parquet in the output directory.
+    """
+    for study in studies:
+        if study not in STUDIES:
+            raise InvalidStudyError(f"Study should be one of {', '.join(STUDIES)}.")
+    if isinstance(grids, str):
+        grids = read_manifest(grids) if Path(grids).is_file() else discover_grids(grids)
+    for grid_id in grids:
+        check_grid_id(grid_id)
+    Path(output_directory).mkdir(parents=True, exist_ok=True)
+    records: List[Dict[str, object]] = []
+
+    def finished(record: Dict[str, object]) -> None:
+        records.append(record)
+        if progress is not None:
+            progress(record, len(records), len(grids))
+
+    if processes is None or processes <= 1:
+        for grid_id, paths in grids.items():
+            finished(_run_grid_safely(grid_id, paths, studies, output_directory, analysis_options))
+    else:
+        _run_in_processes(grids, studies, output_directory, analysis_options, processes=processes, finished=finished)
+    order = {grid_id: position for position, grid_id in enumerate(grids)}
+    status = pd.DataFrame(
+        sorted(records, key=lambda record: order[record["grid_id"]]),
+        columns=["grid_id", "status", "error", "rows", "seconds"],
+    )
+    status.to_parquet(Path(output_directory) / "fleet_status.parquet", index=False)
+    return status
@@ -4,10 +4,12 @@ This is a skeleton for the graph processing assignment.
 We define a graph processor class with some function skeletons.
 """
 
+# pylint: disable=line-too-long,too-many-instance-attributes,too-many-locals
 # setup:
-from typing import List, Tuple
+from typing import Dict, List, Set, Tuple
 
 import networkx as nx
+import numpy as np
 
 
 class IDNotFoundError(Exception):
@@ -70,31 +72,96 @@ class EdgeAlreadyDisabledError(Exception):
         print(error)
 
 
+class EdgeAlreadyEnabledError(Exception):
+    """
+    related edge has already been enabled
+    """
+
+    def __init__(self, error: str) -> None:
+        self.error = error
+        print(error)
+
+
+def _component_labels(n_vertices: int, pairs: np.ndarray) -> np.ndarray:
+    """
+    Connected component label (smallest vertex index) of every vertex, by union-find on arrays:
+    every round hooks the root of the larger label onto the smaller one for all edges at once
+    and then compresses the pointers until every vertex points at its root
+    """
+    label = np.arange(n_vertices)
+    while True:
+        first, second = label[pairs[:, 0]], label[pairs[:, 1]]
+        merge = first != second
+        if not merge.any():
+            return label
+        np.minimum.at(label, np.maximum(first, second)[merge], np.minimum(first, second)[merge])
+        while True:
+            jumped = label[label]
+            if np.array_equal(jumped, label):
+                break
+            label = jumped
+
+
+def _breadth_first_tree(n_vertices: int, pairs: np.ndarray, root: int):
+    """
+    Breadth first search of a tree given as vertex index pairs, one vectorised step per level.
+    Return the vertices per level, and per vertex the parent, the position of the edge to the parent
+    in pairs (-1 for the root) and the depth.
+    """
+    ends = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    order = np.argsort(ends, kind="stable")
+    neighbours = np.concatenate([pairs[:, 1], pairs[:, 0]])[order]
+    neighbour_edges = np.concatenate([np.arange(len(pairs)), np.arange(len(pairs))])[order]
+    offsets = np.zeros(n_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=n_vertices), out=offsets[1:])
+    parent = np.full(n_vertices, -1)
+    parent_edge = np.full(n_vertices, -1)
+    depth = np.zeros(n_vertices, dtype=np.int64)
+    visited = np.zeros(n_vertices, dtype=bool)
+    visited[root] = True
+    levels = [np.array([root])]
+    while len(levels[-1]):
+        frontier = levels[-1]
+        counts = offsets[frontier + 1] - offsets[frontier]
+        slots = np.repeat(offsets[frontier] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        reached = ~visited[neighbours[slots]]
+        slots = slots[reached]
+        vertices = neighbours[slots]
+        visited[vertices] = True
+        parent[vertices] = np.repeat(frontier, counts)[reached]
+        parent_edge[vertices] = neighbour_edges[slots]
+        depth[vertices] = depth[parent[vertices]] + 1
+        levels.append(vertices)
+    return levels[:-1], parent, parent_edge, depth
+
+
 class GraphProcessor:
     """
     General documentation of this class.
     You need to describe the purpose of this class and the functions in it.
     We are using an undirected graph in the processor.
+    The edges can be given as lists or as NumPy arrays (edge_vertex_id_pairs with shape (edges, 2)).
+    The input is validated with vectorised set operations and union-find on integer arrays,
+    networkx is only used when the `network` property is requested.
     """
 
     def __init__(
         self,
-        edge_ids: List[int],
-        edge_vertex_id_pairs: List[Tuple[int, int]],
-        edge_enabled: List[bool],
+        edge_ids: List[int] | np.ndarray,
+        edge_vertex_id_pairs: List[Tuple[int, int]] | np.ndarray,
+        edge_enabled: List[bool] | np.ndarray,
         source_vertex_id: int,
     ) -> None:
 
-        # put your implementation here
+        # the checks run vectorised on integer arrays, vertex indices are positions in the sorted vertex IDs
+        pair_array = np.asarray(edge_vertex_id_pairs, dtype=np.int64).reshape(-1, 2)
+        edge_array = np.asarray(edge_ids, dtype=np.int64)
+        vertex_array = np.unique(pair_array)
         # 1. vertex_ids and edge_ids should be unique.
-        vertex_ids = {node for pairs in edge_vertex_id_pairs for node in pairs}
-        # if len(set(vertex_ids)) != len(vertex_ids):
-        #     raise IDNotUniqueError("Vertex IDs contains duplicated IDs.")
-        if len(set(edge_ids)) != len(edge_ids):
+        if len(np.unique(edge_array)) != len(edge_array):
             raise IDNotUniqueError("Edge IDs contains duplicated IDs.")
-        for n in vertex_ids:
-            if n in edge_ids:
-                raise IDNotUniqueError("Vertex IDs contains ID also in edge IDs.")
+        if np.isin(vertex_array, edge_array).any():
+            raise IDNotUniqueError("Vertex IDs contains ID also in edge IDs.")
         # 2. edge_vertex_id_pairs should have the same length as edge_ids.
         if len(edge_vertex_id_pairs) != len(edge_ids):
             error = "Edge IDs length not equals to vertex ID pairs length."
@@ -103,77 +170,317 @@ class GraphProcessor:
         if len(edge_enabled) != len(edge_ids):
             raise InputLengthDoesNotMatchError("Edge ID length not equal to edge status length.")
         # 5. source_vertex_id should be a valid vertex id.
-        if source_vertex_id not in vertex_ids:
+        if not np.isin(source_vertex_id, vertex_array):
             raise IDNotFoundError("Source ID should be a valid vertex ID.")
         # 6. The graph should be fully connected. (GraphNotFullyConnectedError)
-        enabled_edge_ids = [id for id, is_true in zip(edge_ids, edge_enabled) if is_true]
-        enabled_pairs = [id for id, is_true in zip(edge_vertex_id_pairs, edge_enabled) if is_true]
-        # enabled_vertex_ids = {id for edge in enabled_pairs for id in edge}
-        network = nx.Graph()
-        network.add_nodes_from(vertex_ids)
-        network.add_edges_from(enabled_pairs)
-        if not nx.is_connected(G=network):
+        # a copy, the topology updates change the edge status in place
+        enabled = np.array(edge_enabled, dtype=bool)
+        pair_index = np.searchsorted(vertex_array, pair_array)
+        labels = _component_labels(len(vertex_array), pair_index[enabled])
+        if (labels != labels[0]).any():
             raise GraphNotFullyConnectedError("Grid should be fully connected.")
         # 7. The graph should not contain cycles. (GraphCycleError)
-        # if len(enabled_vertex_ids) - 1 != len(enabled_edge_ids):
-        if nx.cycle_basis(network):
+        # a connected graph is a tree exactly when it has one edge less than vertices
+        if np.count_nonzero(enabled) != len(vertex_array) - 1:
             raise GraphCycleError("Grid should be acyclic.")
-        self.vertex_ids = vertex_ids
         self.edge_ids = edge_ids
         self.edge_vertex_id_pairs = edge_vertex_id_pairs
         self.source_vertex_id = source_vertex_id
-        self.enabled_edge_ids = enabled_edge_ids
-        self.enabled_pairs = enabled_pairs
-        self.network = network
+        self.edge_order = np.argsort(edge_array)
+        self.sorted_edge_ids = edge_array[self.edge_order]
+        self.edge_enabled = enabled
+        self.vertex_array = vertex_array
+        self.pair_index = pair_index
+        self._build_tree_index()
 
-    def find_downstream_vertices(self, edge_id: int) -> List[int]:
+    @property
+    def vertex_ids(self) -> Set[int]:
+        """
+        Set of all vertex IDs
+        """
+        return set(self.vertex_array.tolist())
+
+    @property
+    def enabled_edge_ids(self) -> List[int]:
+        """
+        IDs of the enabled edges
+        """
+        return [self.edge_ids[index] for index in np.flatnonzero(self.edge_enabled)]
+
+    @property
+    def enabled_pairs(self) -> List[Tuple[int, int]]:
+        """
+        Vertex ID pairs of the enabled edges
+        """
+        return [self.edge_vertex_id_pairs[index] for index in np.flatnonzero(self.edge_enabled)]
+
+    @property
+    def network(self) -> nx.Graph:
+        """
+        The enabled graph as a networkx graph, built on request
+        """
+        network = nx.Graph()
+        network.add_nodes_from(self.vertex_ids)
+        network.add_edges_from(self.enabled_pairs)
+        return network
+
+    def _build_tree_index(self) -> None:
+        """
+        Store the spanning tree as an Euler tour from the source vertex: a (3, 2 * (vertices - 1)) array
+        of directed edge tokens (from vertex index, to vertex index, edge index), in which every edge
+        appears once going away from the source and once coming back.
+        The tour is kept per connected component (0 is the component of the source), so switching
+        actions only cut, rotate and splice tours instead of traversing the graph.
+        The tour is laid out from a breadth first search: a vertex is entered at position
+        2 * preorder position - depth - 1 and left 2 * subtree size - 1 tokens later.
+        """
+        n_vertices = len(self.vertex_array)
+        self.source_index = int(np.searchsorted(self.vertex_array, self.source_vertex_id))
+        enabled_edges = np.flatnonzero(self.edge_enabled)
+        levels, parent, parent_edge, depth = _breadth_first_tree(
+            n_vertices, self.pair_index[enabled_edges], self.source_index
+        )
+        parent_edge = np.where(parent_edge < 0, -1, enabled_edges[parent_edge])
+        size = np.ones(n_vertices, dtype=np.int64)
+        for level in reversed(levels[1:]):
+            np.add.at(size, parent[level], size[level])
+        children = np.concatenate(levels[1:]) if len(levels) > 1 else np.empty(0, dtype=np.int64)
+        # siblings follow each other in preorder, each after the subtrees of the previous ones
+        siblings = children[np.argsort(parent[children], kind="stable")]
+        offset = np.cumsum(size[siblings]) - size[siblings]
+        _, group_start, group = np.unique(parent[siblings], return_index=True, return_inverse=True)
+        sibling_offset = np.zeros(n_vertices, dtype=np.int64)
+        sibling_offset[siblings] = offset - offset[group_start][group]
+        entry = np.zeros(n_vertices, dtype=np.int64)
+        for level in levels[1:]:
+            entry[level] = entry[parent[level]] + 1 + sibling_offset[level]
+        down = 2 * entry[children] - depth[children] - 1
+        up = down + 2 * size[children] - 1
+        tour = np.empty((3, 2 * len(children)), dtype=np.int64)
+        tour[:, down] = [parent[children], children, parent_edge[children]]
+        tour[:, up] = [children, parent[children], parent_edge[children]]
+        self.component = np.zeros(n_vertices, dtype=np.int64)
+        self.tours = {0: tour}
+        self.tour_roots = {0: self.source_index}
+        self.parent = parent
+        self.depth = depth
+        self.parent_edge = parent_edge
+        self.preorder = self.vertex_array[np.argsort(entry)]
+        self.entry = entry
+        self.exit = entry + size
+        self.index_outdated = False
+
+    def _index_tour(self) -> None:
         """
-        Find downstream vertices by using dfs on 2 vertices
-        from the corresponding edge
+        Derive the rooted tree arrays from the Euler tour of the source component:
+        * parent: parent vertex index (-1 for the source)
+        * depth: number of edges between the vertex and the source
+        * parent_edge: index of the edge connecting the vertex to its parent (-1 for the source)
+        * preorder: vertex IDs in dfs preorder from the source
+        * entry / exit: [entry, exit) is the slice of preorder holding the subtree of the vertex
         """
-        if edge_id not in self.edge_ids:
+        from_vertex, to_vertex, edge = self.tours[0]
+        n_vertices = len(self.vertex_array)
+        positions = np.arange(len(edge))
+        first = np.full(len(self.edge_ids), len(edge))
+        last = np.full(len(self.edge_ids), -1)
+        np.minimum.at(first, edge, positions)
+        np.maximum.at(last, edge, positions)
+        # the first token of an edge goes away from the source
+        down = first[edge] == positions
+        children = to_vertex[down]
+        parent = np.full(n_vertices, -1)
+        parent[children] = from_vertex[down]
+        parent_edge = np.full(n_vertices, -1)
+        parent_edge[children] = edge[down]
+        depth = np.zeros(n_vertices, dtype=int)
+        depth[children] = np.cumsum(np.where(down, 1, -1))[down]
+        order = np.concatenate([[self.source_index], children]).astype(int)
+        entry = np.empty(n_vertices, dtype=int)
+        entry[order] = np.arange(n_vertices)
+        # the subtree of a child holds the vertices entered between its two tokens
+        entered = np.cumsum(down)
+        size = np.full(n_vertices, n_vertices)
+        size[children] = entered[last[edge[down]]] - entered[down] + 1
+        self.parent = parent
+        self.depth = depth
+        self.parent_edge = parent_edge
+        self.preorder = self.vertex_array[order]
+        self.entry = entry
+        self.exit = entry + size
+        self.index_outdated = False
+
+    def _refresh_index(self) -> None:
+        """
+        Re-derive the tree arrays after switching actions, only when a query needs them
+        """
+        if len(self.tours) > 1:
+            raise GraphNotFullyConnectedError("Grid should be fully connected.")
+        if self.index_outdated:
+            self._index_tour()
+
+    def _edge_index_of(self, edge_id: int) -> int:
+        position = np.searchsorted(self.sorted_edge_ids, edge_id)
+        if position == len(self.sorted_edge_ids) or self.sorted_edge_ids[position] != edge_id:
             raise IDNotFoundError("Invalid edge ID.")
-        if edge_id not in self.enabled_edge_ids:
+        return int(self.edge_order[position])
+
+    def _set_edge_status(self, index: int, enabled: bool) -> None:
+        self.edge_enabled[index] = enabled
+        self.index_outdated = True
+
+    def disable_edge(self, edge_id: int) -> None:
+        """
+        Disable an enabled edge. The part of the tree it connected is cut off as a separate component,
+        which keeps its own Euler tour until an edge reconnects it. Queries raise
+        GraphNotFullyConnectedError as long as the grid is not fully connected.
+        """
+        index = self._edge_index_of(edge_id)
+        if not self.edge_enabled[index]:
+            raise EdgeAlreadyDisabledError("Edge is already disabled.")
+        component = self.component[self.pair_index[index, 0]]
+        tour = self.tours[component]
+        down, up = np.flatnonzero(tour[2] == index)
+        island = max(self.tours) + 1
+        self.tours[island] = tour[:, down + 1 : up]
+        self.tour_roots[island] = int(tour[1, down])
+        self.tours[component] = np.concatenate([tour[:, :down], tour[:, up + 1 :]], axis=1)
+        self.component[tour[1, down:up]] = island
+        self._set_edge_status(index, enabled=False)
+
+    def enable_edge(self, edge_id: int) -> None:
+        """
+        Enable a disabled edge, which must connect two separate components.
+        The component without the source is re-rooted at its endpoint of the edge
+        (a rotation of its Euler tour) and spliced into the tour of the other component.
+        """
+        index = self._edge_index_of(edge_id)
+        if self.edge_enabled[index]:
+            raise EdgeAlreadyEnabledError("Edge is already enabled.")
+        first, second = self.pair_index[index]
+        if self.component[first] == self.component[second]:
+            raise GraphCycleError("Grid should be acyclic.")
+        # the component of the source always keeps its root
+        host_vertex, guest_vertex = (
+            (first, second) if self.component[first] < self.component[second] else (second, first)
+        )
+        host, guest = self.component[host_vertex], self.component[guest_vertex]
+        guest_tour = self.tours.pop(guest)
+        if self.tour_roots.pop(guest) != guest_vertex:
+            guest_tour = np.roll(guest_tour, -np.flatnonzero(guest_tour[0] == guest_vertex)[0], axis=1)
+        host_tour = self.tours[host]
+        position = 0 if self.tour_roots[host] == host_vertex else np.flatnonzero(host_tour[1] == host_vertex)[0] + 1
+        self.tours[host] = np.concatenate(
+            [
+                host_tour[:, :position],
+                [[host_vertex], [guest_vertex], [index]],
+                guest_tour,
+                [[guest_vertex], [host_vertex], [index]],
+                host_tour[:, position:],
+            ],
+            axis=1,
+        )
+        self.component[self.component == guest] = host
+        self._set_edge_status(index, enabled=True)
+
+    def swap_edge(self, disabled_edge_id: int, enabled_edge_id: int) -> None:
+        """
+        Switching action keeping the grid a tree: disable an enabled edge and enable one of its
+        alternative edges. If the edge to enable does not reconnect the grid, nothing is changed
+        and GraphCycleError is raised.
+        """
+        enabled_index = self._edge_index_of(enabled_edge_id)
+        if self.edge_enabled[enabled_index]:
+            raise EdgeAlreadyEnabledError("Edge is already enabled.")
+        self.disable_edge(disabled_edge_id)
+        try:
+            self.enable_edge(enabled_edge_id)
+        except GraphCycleError:
+            self.enable_edge(disabled_edge_id)
+            raise
+
+    def _child_vertex(self, index: int) -> int:
+        """
+        Vertex index of the endpoint of an enabled edge which is further from the source
+        """
+        first, second = self.pair_index[index]
+        return first if self.depth[first] > self.depth[second] else second
+
+    def find_downstream_vertices(self, edge_id: int) -> List[int]:
+        """
+        Find downstream vertices by looking up the subtree of the far endpoint
+        of the corresponding edge in the preorder of the rooted tree
+        """
+        index = self._edge_index_of(edge_id)
+        self._refresh_index()
+        if not self.edge_enabled[index]:
             return []
-        index = self.edge_ids.index(edge_id)
-        vertex_ids = self.edge_vertex_id_pairs[index]
-        self.network.remove_edge(*vertex_ids)
-        downstream_vertices = []
-        for vertex_id in vertex_ids:
-            output = list(nx.dfs_preorder_nodes(self.network, source=vertex_id))
-            if self.source_vertex_id not in output:
-                downstream_vertices = output
-                break
-        # recovering the graph:
-        self.network.add_edge(*vertex_ids)
-        return downstream_vertices
+        child = self._child_vertex(index)
+        return self.preorder[self.entry[child] : self.exit[child]].tolist()
+
+    def find_downstream_labels(self, edge_ids: List[int]) -> np.ndarray:
+        """
+        Label every vertex (in the order of vertex_array) with the ID of the given edge
+        it is downstream of, or -1 if it is not downstream of any of them.
+        For nested edges the label of the edge furthest from the source wins.
+        """
+        self._refresh_index()
+        edge_indices = [self._edge_index_of(edge_id) for edge_id in edge_ids]
+        edge_indices = [index for index in edge_indices if self.edge_enabled[index]]
+        edge_indices.sort(key=lambda index: self.depth[self._child_vertex(index)])
+        labels = np.full(len(self.preorder), -1, dtype=np.int64)
+        for index in edge_indices:
+            child = self._child_vertex(index)
+            labels[self.entry[child] : self.exit[child]] = self.edge_ids[index]
+        return labels[self.entry]
+
+    def find_downstream_sums(self, values: np.ndarray) -> np.ndarray:
+        """
+        Backward sweep over the tree: for every edge (in the order of edge_ids) the sum of the values
+        of the vertices downstream of it, 0 for disabled edges.
+        values has the shape (..., vertices) in the order of vertex_array, the result (..., edges).
+        """
+        self._refresh_index()
+        enabled = np.flatnonzero(self.edge_enabled)
+        pairs = self.pair_index[enabled]
+        children = np.where(self.depth[pairs[:, 0]] > self.depth[pairs[:, 1]], pairs[:, 0], pairs[:, 1])
+        in_preorder = np.asarray(values)[..., np.searchsorted(self.vertex_array, self.preorder)]
+        cumulative = np.zeros(in_preorder.shape[:-1] + (in_preorder.shape[-1] + 1,))
+        np.cumsum(in_preorder, axis=-1, out=cumulative[..., 1:])
+        sums = np.zeros(in_preorder.shape[:-1] + (len(self.edge_enabled),))
+        sums[..., enabled] = cumulative[..., self.exit[children]] - cumulative[..., self.entry[children]]
+        return sums
 
     def find_alternative_edges(self, disabled_edge_id: int) -> List[int]:
         """
-        Find alternative edges by continously enabling each disabled edge
-        and checking if the grid becomes connected.
+        Find alternative edges for a disabled edge. A disabled edge reconnects the grid
+        exactly when one of its vertices lies in the subtree cut off by the disabled edge,
+        i.e. when the tree path between its vertices passes the disabled edge.
         """
-        # put your implementation here
-        if disabled_edge_id not in self.edge_ids:
-            raise IDNotFoundError("Invalid edge ID.")
-        if disabled_edge_id not in self.enabled_edge_ids:
+        index = self._edge_index_of(disabled_edge_id)
+        self._refresh_index()
+        if not self.edge_enabled[index]:
             raise EdgeAlreadyDisabledError("Edge is already disabled.")
-        # get data related to disabled_edge_id
-        index = self.edge_ids.index(disabled_edge_id)
-        vertex_ids = self.edge_vertex_id_pairs[index]
-        self.enabled_pairs.remove(vertex_ids)
-        self.network.remove_edge(*vertex_ids)
-        alternative_edges = []
-        for vertices_pair in self.edge_vertex_id_pairs:
-            if vertices_pair not in self.enabled_pairs:
-                self.network.add_edge(*vertices_pair)
-                if not nx.cycle_basis(self.network) and nx.is_connected(self.network):
-                    edge_index = self.edge_vertex_id_pairs.index(vertices_pair)
-                    alternative_edges.append(self.edge_ids[edge_index])
-                self.network.remove_edge(*vertices_pair)
-        # recovering the network
-        self.enabled_pairs.append(vertex_ids)
-        self.network.add_edge(*vertex_ids)
-        if disabled_edge_id in alternative_edges:
-            alternative_edges.remove(disabled_edge_id)
+        child = self._child_vertex(index)
+        candidates = np.flatnonzero(~self.edge_enabled)
+        positions = self.entry[self.pair_index[candidates]]
+        in_subtree = (positions >= self.entry[child]) & (positions < self.exit[child])
+        alternatives = candidates[in_subtree[:, 0] != in_subtree[:, 1]]
+        return [self.edge_ids[alternative] for alternative in alternatives]
+
+    def find_all_alternative_edges(self) -> Dict[int, List[int]]:
+        """
+        Find the alternative edges of every enabled edge in one pass.
+        Each disabled edge is an alternative for all the edges on the tree path
+        between its vertices, which is walked up to the lowest common ancestor.
+        """
+        self._refresh_index()
+        alternative_edges = {self.edge_ids[index]: [] for index in np.flatnonzero(self.edge_enabled)}
+        for index in np.flatnonzero(~self.edge_enabled):
+            first, second = self.pair_index[index]
+            while first != second:
+                if self.depth[first] < self.depth[second]:
+                    first, second = second, first
+                alternative_edges[self.edge_ids[self.parent_edge[first]]].append(self.edge_ids[index])
+                first = self.parent[first]
         return alternative_edges
@@ -2,19 +2,37 @@
 This package performs some low voltage grid analytic functions.
 """
 
-# pylint: disable=line-too-long
+# pylint: disable=line-too-long,too-many-locals,too-many-instance-attributes,too-many-arguments,too-many-statements,too-many-lines
 import random
 from math import floor
-from typing import Dict, List, Union
+from typing import Callable, Dict, List, Union
 
 import numpy as np
 import pandas as pd
-from power_grid_model import CalculationMethod, CalculationType, PowerGridModel, initialize_array
+from power_grid_model import CalculationType, PowerGridModel, initialize_array
 from power_grid_model.utils import json_deserialize_from_file
-from power_grid_model.validation import assert_valid_batch_data, assert_valid_input_data
 
 from power_system_simulation.graph_processing import GraphProcessor
-from power_system_simulation.power_grid_modelling import PowerGridModelling
+from power_system_simulation.power_grid_modelling import (
+    BatchData,
+    InvalidChunkSizeError,
+    OutputComponentTypes,
+    PowerGridModelling,
+    ShardPool,
+    calculate_batch,
+    line_energy_loss,
+    sparse_batch,
+    voltage_deviation,
+)
+from power_system_simulation.profile_loading import ProfileOverlay, ProfileTable
+from power_system_simulation.profiling import phase, profiled
+from power_system_simulation.result_cache import ResultCache
+from power_system_simulation.result_sink import ParquetSink
+from power_system_simulation.timestamp_reduction import TimestampReduction
+from power_system_simulation.validation_cache import validate_batch_data, validate_input_data
+
+# EV profiles per read when the EV pool is aggregated, bounds the memory of the read
+EV_POOL_READ_COLUMNS = 256
 
 
 class InvalidNumberOfSourceError(Exception):
@@ -87,6 +105,26 @@ class LineNotFullyConnectedError(Exception):
         print(error)
 
 
+class InvalidCriterionError(Exception):
+    """
+    Optimization criterion is not supported
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
+class InvalidPenetrationLevelError(Exception):
+    """
+    Penetration level requires more EVs than houses in a feeder
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
 def data_conversion(data: list[Union[str, str, str, str]]):
     """
     Convert data from path to dict and dataframes
@@ -95,11 +133,15 @@ def data_conversion(data: list[Union[str, str, str, str]]):
     active_load_profile_path = data[1]
     reactive_load_profile_path = data[2]
     ev_pool_path = data[3]
-    dataset = json_deserialize_from_file(data_path)
-    assert_valid_input_data(input_data=dataset, calculation_type=CalculationType.power_flow)
-    active_load_profile = pd.read_parquet(active_load_profile_path)
-    reactive_load_profile = pd.read_parquet(reactive_load_profile_path)
-    ev_pool = pd.read_parquet(ev_pool_path)
+    with phase("deserialize"):
+        dataset = json_deserialize_from_file(data_path)
+    with phase("validate_input"):
+        validate_input_data(input_data=dataset, calculation_type=CalculationType.power_flow)
+    with phase("read_profiles"):
+        active_load_profile = ProfileTable(active_load_profile_path).to_pandas()
+        reactive_load_profile = ProfileTable(reactive_load_profile_path).to_pandas()
+        # EV profiles are only read from the file when they are assigned to a house
+        ev_pool = ProfileTable(ev_pool_path)
     return dataset, active_load_profile, reactive_load_profile, ev_pool
 
 
@@ -145,26 +187,25 @@ def batch_data_assertion(
     input_data = dataset
     updated_data = new_dataset
     calculation_type = CalculationType.power_flow
-    assert_valid_batch_data(input_data=input_data, update_data=updated_data, calculation_type=calculation_type)
+    validate_batch_data(input_data=input_data, update_data=updated_data, calculation_type=calculation_type)
     return new_dataset
 
 
+@profiled("graph_creator")
 def graph_creator(dataset: Dict[str, np.ndarray | Dict[str, np.ndarray]]) -> GraphProcessor:
     """
     Create a graph based on given data
     """
     # vertex_ids = list(dataset['node']['id'])
-    edge_ids = list(dataset["transformer"]["id"])
-    edge_ids = edge_ids + list(dataset["line"]["id"])
-    print(edge_ids)
-    edge_vertex_id_pairs = list(zip(dataset["transformer"]["from_node"], dataset["transformer"]["to_node"]))
-    edge_vertex_id_pairs += list(zip(dataset["line"]["from_node"], dataset["line"]["to_node"]))
-    print(edge_vertex_id_pairs)
-    status_enabled = list(dataset["transformer"]["to_status"])
-    status_enabled = status_enabled + list(dataset["line"]["to_status"])
-    edge_enabled = [bool(status) for status in status_enabled]
-    print(edge_enabled)
-    source_vertex_id = int(dataset["source"]["node"])
+    edge_ids = np.concatenate([dataset["transformer"]["id"], dataset["line"]["id"]]).tolist()
+    edge_vertex_id_pairs = np.column_stack(
+        [
+            np.concatenate([dataset["transformer"]["from_node"], dataset["line"]["from_node"]]),
+            np.concatenate([dataset["transformer"]["to_node"], dataset["line"]["to_node"]]),
+        ]
+    )
+    edge_enabled = np.concatenate([dataset["transformer"]["to_status"], dataset["line"]["to_status"]]).astype(bool)
+    source_vertex_id = int(dataset["source"]["node"][0])
     grid = GraphProcessor(
         # vertex_ids=vertex_ids,
         edge_ids=edge_ids,
@@ -175,11 +216,39 @@ def graph_creator(dataset: Dict[str, np.ndarray | Dict[str, np.ndarray]]) -> Gra
     return grid
 
 
+def feeder_index(
+    dataset: Dict[str, np.ndarray | Dict[str, np.ndarray]],
+    grid: GraphProcessor,
+    feeder_ids: List[int],
+):
+    """
+    Label each node and each sym_load with the feeder ID it belongs to (-1 if none),
+    aligned with the node and sym_load arrays of the dataset
+    """
+    vertex_labels = grid.find_downstream_labels(feeder_ids)
+    node_feeder_ids = vertex_labels[np.searchsorted(grid.vertex_array, dataset["node"]["id"])]
+    node_order = np.argsort(dataset["node"]["id"])
+    load_node_idx = node_order[np.searchsorted(dataset["node"]["id"], dataset["sym_load"]["node"], sorter=node_order)]
+    load_feeder_ids = node_feeder_ids[load_node_idx]
+    return node_feeder_ids, load_feeder_ids
+
+
+def id_position(sorted_ids: np.ndarray, order: np.ndarray, element_id: int) -> int | None:
+    """
+    Position of an ID in its unsorted array, given the sorted IDs and the sorting order,
+    None if the ID is not in the array
+    """
+    position = np.searchsorted(sorted_ids, element_id)
+    if position == len(sorted_ids) or sorted_ids[position] != element_id:
+        return None
+    return int(order[position])
+
+
 def load_profiles_assertion(
     dataset: Dict[str, np.ndarray | Dict[str, np.ndarray]],
     active_load_profile: pd.DataFrame,
     reactive_load_profile: pd.DataFrame,
-    ev_pool: pd.DataFrame,
+    ev_pool: ProfileTable,
 ):
     """
     Assert the load profiles and the ev pool
@@ -195,6 +264,17 @@ def load_profiles_assertion(
         raise InvalidProfilesError("Number of EV profile should be at least the same as number of sym load.")
 
 
+def ev_pool_mean(ev_pool: ProfileTable) -> np.ndarray:
+    """
+    Mean power of the EV profiles per timestamp, read in blocks of EV profiles
+    """
+    total = np.zeros(len(ev_pool.index))
+    for start in range(0, len(ev_pool.columns), EV_POOL_READ_COLUMNS):
+        columns = np.arange(start, min(start + EV_POOL_READ_COLUMNS, len(ev_pool.columns)))
+        total += ev_pool.read(columns=columns).sum(axis=1)
+    return total / max(len(ev_pool.columns), 1)
+
+
 def alternative_grid_error(grid: GraphProcessor, input_data, edge_id: int):
     """
     Raise errors for alternative grid functionality
@@ -213,7 +293,26 @@ class GridAnalysis:
     Build a package with some low voltage (LV) grid analytics functions.
     """
 
-    def __init__(self, data: List[Union[str, str, str, str]], feeder_ids: List[int]) -> None:
+    @profiled("GridAnalysis")
+    def __init__(
+        self,
+        data: List[Union[str, str, str, str]],
+        feeder_ids: List[int],
+        threading: int = -1,
+        processes: int | None = None,
+        cache: ResultCache | None = None,
+        *,
+        calculation_method: str = "newton_raphson",
+        error_tolerance: float = 1e-8,
+        max_iterations: int = 20,
+        auto_max_iterations: int = 5,
+        representatives: int | None = None,
+        reduction_seed: int | None = None,
+        sink: ParquetSink | None = None,
+        scenario_chunk_size: int | None = None,
+        output_dtype: str | np.dtype | None = None,
+        sparse_ev_update: bool = False,
+    ) -> None:
         """
         Input:
         * A LV grid in PGM input format
@@ -231,6 +330,29 @@ class GridAnalysis:
         * The profiles provide the active power curve per EV.
         * The reactive power is assumed to be always zero.
         * The number of profiles is at least as many as the number of `sym_load` in the grid.
+        Optional execution backend used by every study:
+        * threading: number of PGM threads for the batch calculations (-1 sequential, 0 all cores)
+        * processes: number of worker processes the batch scenarios are sharded over, the processes are
+          started once and kept for all studies until `close`
+        * cache: on-disk result cache the batch outputs are read from or stored in
+        * calculation_method: linear, linear_current, iterative_current, newton_raphson (default) or auto,
+          with error_tolerance and max_iterations for the iterative methods and auto_max_iterations
+          for the fast pass of auto (see `calculate_batch`)
+        * output_dtype: dtype (e.g. float32) the output attributes used by the studies are cast to,
+          the studies only keep the attributes they use
+        * representatives: cluster the active and reactive power of every load and the mean power of the
+          EV pool into this many representative timestamps (seeded by reduction_seed) and run the studies on those only,
+          see `TimestampReduction`. Maxima and minima are reported at the representative timestamps,
+          the energy loss is weighted by the timestamps each representative stands for.
+        * sink: `ParquetSink` every study writes its result table to, and with raw output the node and line
+          output of every batch chunk, partitioned by scenario (e.g. tap position or EV sample) and date
+        * scenario_chunk_size: number of scenarios per batch calculation of a study, every chunk is reduced
+          (and written to the sink) before the next one is calculated, by default all scenarios in one batch
+        * sparse_ev_update: submit the EV scenarios as sparse batch updates, with per scenario and timestamp
+          only the houses with an EV and the loads whose profile differs from the input data
+        The PGM model is built once here. Every study expresses its outages, tap positions and EVs
+        as batch update data on this model, the model itself is never changed or copied.
+        Inside a `Profiler` the construction and every study are recorded as phases.
         """
         # # unzip:
         # data_path = data[0]
@@ -252,15 +374,18 @@ class GridAnalysis:
         #     reactive_load_profile = pd.read_parquet(reactive_load_profile_path)
         # else:
         #     reactive_load_profile = reactive_load_profile_path
+        if scenario_chunk_size is not None and scenario_chunk_size < 1:
+            raise InvalidChunkSizeError("Scenario chunk size should be at least 1.")
         data_unzipped = data_conversion(data=data)
         dataset = data_unzipped[0]
         active_load_profile = data_unzipped[1]
         reactive_load_profile = data_unzipped[2]
         ev_pool = data_unzipped[3]
         simple_error_check(dataset=dataset, feeder_ids=feeder_ids)
-        batch_data_assertion(
-            dataset=dataset, active_load_profile=active_load_profile, reactive_load_profile=reactive_load_profile
-        )
+        with phase("validate_batch"):
+            load_profile = batch_data_assertion(
+                dataset=dataset, active_load_profile=active_load_profile, reactive_load_profile=reactive_load_profile
+            )["sym_load"]
         # if not active_load_profile.index.equals(reactive_load_profile.index):
         #     raise InvalidProfilesError("Load profiles should have matching timestamps.")
         # load_profile = initialize_array("update", "sym_load", active_load_profile.shape)
@@ -327,7 +452,22 @@ class GridAnalysis:
             reactive_load_profile=reactive_load_profile,
             ev_pool=ev_pool,
         )
-        model = PowerGridModel(dataset)
+        reduction = None
+        if representatives is not None:
+            with phase("reduction"):
+                # the EV profiles are not tied to loads, one aggregate keeps them from dominating the distances
+                snapshots = np.hstack(
+                    [
+                        active_load_profile.to_numpy(),
+                        reactive_load_profile.to_numpy(),
+                        ev_pool_mean(ev_pool)[:, np.newaxis],
+                    ]
+                )
+                reduction = TimestampReduction(snapshots, representatives, seed=reduction_seed)
+        with phase("feeder_index"):
+            node_feeder_ids, load_feeder_ids = feeder_index(dataset=dataset, grid=grid, feeder_ids=feeder_ids)
+        with phase("model_construction"):
+            model = PowerGridModel(dataset)
         self.input_data = dataset
         self.model = model
         self.grid = grid
@@ -335,8 +475,118 @@ class GridAnalysis:
         self.reactive_load_profile = reactive_load_profile
         self.feeder_ids = feeder_ids
         self.ev_pool = ev_pool
+        self.reduction = reduction
+        self.sink = sink
+        self.scenario_chunk_size = scenario_chunk_size
+        self.sparse_ev_update = sparse_ev_update
+        # validated once here, the studies reuse it as trusted base update data
+        self.load_profile = self._study_rows(load_profile)
+        # the timestamps the studies calculate: all of them or the representatives
+        self.study_timestamps = self._study_rows(active_load_profile.index)
+        self.threading = threading
+        self.processes = processes
+        self.pool = ShardPool(dataset, processes) if processes is not None and processes > 1 else None
+        self.cache = cache
+        self.calculation_options = {
+            "calculation_method": calculation_method,
+            "error_tolerance": error_tolerance,
+            "max_iterations": max_iterations,
+            "auto_max_iterations": auto_max_iterations,
+            "output_dtype": output_dtype,
+        }
+        self.node_feeder_ids = node_feeder_ids
+        self.load_feeder_ids = load_feeder_ids
+        # sorted IDs with their positions, for the lookups of single nodes and sym_loads
+        node_order = np.argsort(dataset["node"]["id"], kind="stable")
+        load_order = np.argsort(dataset["sym_load"]["id"], kind="stable")
+        self.node_lookup = (dataset["node"]["id"][node_order], node_order)
+        self.load_lookup = (dataset["sym_load"]["id"][load_order], load_order)
+        self.feeder_load_ids = {
+            feeder_id: dataset["sym_load"]["id"][load_feeder_ids == feeder_id] for feeder_id in feeder_ids
+        }
+
+    def close(self) -> None:
+        """
+        Shut down the worker processes of the studies, if any
+        """
+        if self.pool is not None:
+            self.pool.close()
 
-    def alternative_grid_topology(self, edge_id: int):
+    def _study_rows(self, values):
+        """
+        The rows (timestamps) of values the studies calculate, the representative ones with a reduction
+        """
+        return values if self.reduction is None else values[self.reduction.representatives]
+
+    def _calculate_scenarios(
+        self,
+        study: str,
+        update_data: Callable[[np.ndarray], BatchData],
+        output_component_types: OutputComponentTypes,
+        scenarios: Dict[str, np.ndarray],
+    ):
+        """
+        Run the batch of scenarios x study timestamps in chunks of scenario_chunk_size scenarios,
+        with the values of every scenario (e.g. the tap position) in scenarios.
+        The update data is built per chunk by a function of the scenario positions,
+        so only the update data of one chunk is held at a time.
+        Yield per chunk the positions of its scenarios and the output with the shape
+        (scenarios, timestamps, elements). The sink gets the raw output of every chunk.
+        """
+        n_timestamps = len(self.study_timestamps)
+        n_scenarios = len(list(scenarios.values())[0])
+        step = n_scenarios if self.scenario_chunk_size is None else self.scenario_chunk_size
+        for start in range(0, n_scenarios, step):
+            positions = np.arange(start, min(start + step, n_scenarios))
+            output_data = calculate_batch(
+                input_data=self.input_data,
+                update_data=update_data(positions),
+                output_component_types=output_component_types,
+                threading=self.threading,
+                processes=self.processes,
+                model=self.model,
+                pool=self.pool,
+                cache=self.cache,
+                **self.calculation_options,
+            )
+            output_data = {
+                component: output.reshape(len(positions), n_timestamps, -1) for component, output in output_data.items()
+            }
+            if self.sink is not None:
+                self.sink.write_output(
+                    study,
+                    output_data,
+                    self.study_timestamps,
+                    {name: values[positions] for name, values in scenarios.items()},
+                )
+            yield positions, output_data
+
+    def feeder_of_node(self, node_id: int) -> int:
+        """
+        Feeder ID the node belongs to, -1 if it is not downstream of any feeder
+        """
+        position = id_position(*self.node_lookup, node_id)
+        if position is None:
+            raise IDNotFoundError("Node ID provided is not in node IDs.")
+        return int(self.node_feeder_ids[position])
+
+    def feeder_of_sym_load(self, sym_load_id: int) -> int:
+        """
+        Feeder ID the sym_load belongs to, -1 if it is not downstream of any feeder
+        """
+        position = id_position(*self.load_lookup, sym_load_id)
+        if position is None:
+            raise IDNotFoundError("Sym load ID provided is not in sym load IDs.")
+        return int(self.load_feeder_ids[position])
+
+    @profiled("GridAnalysis.alternative_grid_topology")
+    def alternative_grid_topology(
+        self,
+        edge_id: int,
+        top_k: int | None = None,
+        max_loading: float | None = None,
+        margin: float = 0.1,
+    ):
         """
         In this functionality, the user would like to know alternative grid topology
         when a given line is out of service.
@@ -349,86 +599,491 @@ class GridAnalysis:
         * The timestamp of this maximum
         * If there are no alternatives, it still should return an empty table with the
         correct data format and heading. You should test this behaviour in the unit tests.
+        Optionally the alternatives are screened first, see contingency_sweep.
         """
-        alternative_grid_error(grid=self.grid, input_data=self.input_data, edge_id=edge_id)
-        model_rep = self.model.copy()
-        update_line = initialize_array("update", "line", 1)
-        update_line["id"] = [edge_id]
-        update_line["from_status"] = [0]
-        update_line["to_status"] = [0]
-        model_rep.update(update_data={"line": update_line})
-        alternative_lines = self.grid.find_alternative_edges(disabled_edge_id=edge_id)
-        counter = 0
-        max_loading = []
-        max_loading_idx = []
-        timestamps = []
-        if alternative_lines:
-            for _ in alternative_lines:
-                batch_model = model_rep.copy()
-                update_line = initialize_array("update", "line", 1)
-                update_line["id"] = [_]
-                update_line["to_status"] = [1]
-                batch_model.update(update_data={"line": update_line})
-                # load_profile = initialize_array("update", "sym_load",
-                #                                 self.active_load_profile.shape)
-                # load_profile["id"] = self.active_load_profile.columns.to_numpy()
-                # load_profile["p_specified"] = self.active_load_profile.to_numpy()
-                # load_profile["q_specified"] = self.reactive_load_profile.to_numpy()
-                # assert_valid_batch_data(
-                #     input_data=self.input_data,
-                #     update_data={"sym_load": load_profile},
-                #     calculation_type=CalculationType.power_flow
-                # )
-                output_data = batch_model.calculate_power_flow(
-                    update_data=batch_data_assertion(
-                        dataset=self.input_data,
-                        active_load_profile=self.active_load_profile,
-                        reactive_load_profile=self.reactive_load_profile,
-                    ),
-                    output_component_types=["line"],
-                    calculation_method=CalculationMethod.newton_raphson,
-                )
-                max_loading.append(max(np.max(output_data["line"]["loading"], axis=1)))
-                max_loading_index = np.where(output_data["line"]["loading"] == max_loading[counter])
-                max_loading_idx.append(int(self.input_data["line"]["id"][max_loading_index[1]]))
-                timestamps.append(self.active_load_profile.index[max_loading_index[0]][0])
-                counter = counter + 1
+        df_result = self.contingency_sweep(line_ids=[edge_id], top_k=top_k, max_loading=max_loading, margin=margin)
+        return df_result.drop(columns="outage_line_id")
+
+    def _screening_loading(self, scenarios: List[tuple]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Estimate the line loading of every (outage, alternative) scenario without power flow:
+        the line currents follow from a backward sweep of the downstream load sums over the tree
+        of the scenario, at the rated voltage of the from node, ignoring losses and voltage drop.
+        Return per scenario the estimated maximum loading among lines and timestamps,
+        with the line position and timestamp position of this maximum.
+        """
+        line = self.input_data["line"]
+        sym_load = self.input_data["sym_load"]
+        grid = graph_creator(self.input_data)
+        # node power of every timestamp, the loads without profile are left out
+        load_position = pd.Index(sym_load["id"]).get_indexer(self.active_load_profile.columns)
+        load_vertex = np.searchsorted(grid.vertex_array, sym_load["node"][load_position])
+        node_p = np.zeros((len(self.study_timestamps), len(grid.vertex_array)))
+        node_q = np.zeros_like(node_p)
+        np.add.at(node_p, (slice(None), load_vertex), self.load_profile["p_specified"])
+        np.add.at(node_q, (slice(None), load_vertex), self.load_profile["q_specified"])
+        line_edges = len(self.input_data["transformer"]) + np.arange(len(line))
+        node = self.input_data["node"]
+        node_order = np.argsort(node["id"])
+        line_u_rated = node["u_rated"][node_order[np.searchsorted(node["id"], line["from_node"], sorter=node_order)]]
+        loading_max = np.empty(len(scenarios))
+        line_idx_max = np.empty(len(scenarios), dtype=np.int64)
+        timestamp_idx_max = np.empty(len(scenarios), dtype=np.int64)
+        for scenario, (outage, alternative) in enumerate(scenarios):
+            grid.swap_edge(disabled_edge_id=outage, enabled_edge_id=alternative)
+            p_line = grid.find_downstream_sums(node_p)[:, line_edges]
+            q_line = grid.find_downstream_sums(node_q)[:, line_edges]
+            grid.swap_edge(disabled_edge_id=alternative, enabled_edge_id=outage)
+            loading = np.hypot(p_line, q_line) / (np.sqrt(3) * line_u_rated) / line["i_n"]
+            flat_idx_max = int(np.argmax(loading))
+            timestamp_idx_max[scenario], line_idx_max[scenario] = divmod(flat_idx_max, loading.shape[1])
+            loading_max[scenario] = loading.flat[flat_idx_max]
+        return loading_max, line_idx_max, timestamp_idx_max
+
+    @profiled("GridAnalysis.contingency_sweep")
+    def contingency_sweep(
+        self,
+        line_ids: List[int] | None = None,
+        top_k: int | None = None,
+        max_loading: float | None = None,
+        margin: float = 0.1,
+    ) -> pd.DataFrame:
+        """
+        Full N-1 calculation: every given line (by default every line connected at both sides)
+        is taken out of service in turn and every alternative line is connected.
+        All (outage, alternative) scenarios are combined with the load profiles into one
+        batch calculation of size scenarios x timestamps.
+        Return a table with one row per scenario and the following columns:
+        * The Line ID which is out of service
+        * The alternative Line ID to be connected
+        * The maximum loading among of lines and timestamps
+        * The Line ID of this maximum
+        * The timestamp of this maximum
+        Optional screening: with top_k and/or max_loading the loading of every scenario is first
+        estimated with a backward sweep of the load over the tree, and only the top_k alternatives
+        with the lowest estimate per outage line and/or the alternatives with an estimate below
+        max_loading + margin are calculated with the time-series power flow.
+        The table then has an extra column screened_out, and the screened out rows hold the estimate.
+        """
+        with phase("alternative_edges"):
+            if line_ids is None:
+                connected = (self.input_data["line"]["from_status"] == 1) & (self.input_data["line"]["to_status"] == 1)
+                line_ids = self.input_data["line"]["id"][connected].tolist()
+                alternatives = self.grid.find_all_alternative_edges()
+            else:
+                for line_id in line_ids:
+                    alternative_grid_error(grid=self.grid, input_data=self.input_data, edge_id=line_id)
+                alternatives = {
+                    line_id: self.grid.find_alternative_edges(disabled_edge_id=line_id) for line_id in line_ids
+                }
+        scenarios = [(line_id, alternative) for line_id in line_ids for alternative in alternatives[line_id]]
+        screening = top_k is not None or max_loading is not None
         df_result = pd.DataFrame(
             data={
-                "alternative_line_id": alternative_lines,
-                "loading_max": max_loading,
-                "loading_max_line_id": max_loading_idx,
-                "timestamps": timestamps,
+                "outage_line_id": pd.Series([outage for outage, _ in scenarios], dtype=np.int64),
+                "alternative_line_id": pd.Series([alternative for _, alternative in scenarios], dtype=np.int64),
+                "loading_max": pd.Series(np.nan, index=range(len(scenarios)), dtype=np.float64),
+                "loading_max_line_id": pd.Series(0, index=range(len(scenarios)), dtype=np.int64),
+                "timestamps": pd.Series(
+                    pd.NaT, index=range(len(scenarios)), dtype=self.active_load_profile.index.dtype
+                ),
             }
         )
+        if screening:
+            df_result["screened_out"] = False
+        if not scenarios:
+            return df_result
+        calculated = np.arange(len(scenarios))
+        if screening:
+            with phase("screening"):
+                estimate, line_idx_estimate, timestamp_idx_estimate = self._screening_loading(scenarios)
+                keep = np.ones(len(scenarios), dtype=bool)
+                if top_k is not None:
+                    rank = (
+                        df_result.assign(estimate=estimate).groupby("outage_line_id")["estimate"].rank(method="first")
+                    )
+                    keep &= rank.to_numpy() <= top_k
+                if max_loading is not None:
+                    keep &= estimate <= max_loading + margin
+                screened_out = np.flatnonzero(~keep)
+                df_result.loc[screened_out, "screened_out"] = True
+                df_result.loc[screened_out, "loading_max"] = estimate[screened_out]
+                df_result.loc[screened_out, "loading_max_line_id"] = self.input_data["line"]["id"][
+                    line_idx_estimate[screened_out]
+                ]
+                df_result.loc[screened_out, "timestamps"] = self.study_timestamps[timestamp_idx_estimate[screened_out]]
+                calculated = np.flatnonzero(keep)
+        if calculated.size == 0:
+            if self.sink is not None:
+                self.sink.write_table("contingency_sweep", df_result)
+            return df_result
+        n_timestamps = len(self.study_timestamps)
+
+        def update_data(positions: np.ndarray) -> BatchData:
+            with phase("update_data"):
+                update_line = initialize_array("update", "line", (len(positions), 2))
+                update_line["id"] = [scenarios[scenario] for scenario in calculated[positions]]
+                update_line["from_status"][:, 0] = 0
+                update_line["to_status"][:, 0] = 0
+                update_line["to_status"][:, 1] = 1
+                return {
+                    "line": np.repeat(update_line, n_timestamps, axis=0),
+                    "sym_load": np.tile(self.load_profile, (len(positions), 1)),
+                }
+
+        n_lines = len(self.input_data["line"])
+        for positions, output_data in self._calculate_scenarios(
+            "contingency_sweep",
+            update_data,
+            {"line": ["loading"]},
+            {
+                "outage_line_id": df_result["outage_line_id"].to_numpy()[calculated],
+                "alternative_line_id": df_result["alternative_line_id"].to_numpy()[calculated],
+            },
+        ):
+            with phase("aggregation"):
+                loading = output_data["line"]["loading"].reshape(len(positions), -1)
+                flat_idx_max = np.argmax(loading, axis=1)
+                timestamp_idx_max, line_idx_max = np.divmod(flat_idx_max, n_lines)
+                rows = calculated[positions]
+                df_result.loc[rows, "loading_max"] = loading[np.arange(len(positions)), flat_idx_max]
+                df_result.loc[rows, "loading_max_line_id"] = self.input_data["line"]["id"][line_idx_max]
+                df_result.loc[rows, "timestamps"] = self.study_timestamps[timestamp_idx_max]
+        if self.sink is not None:
+            self.sink.write_table("contingency_sweep", df_result)
         return df_result
 
+    @profiled("GridAnalysis.optimal_tap_position")
+    def optimal_tap_position(self, criterion: str = "energy_loss") -> int:
+        """
+        Optimize the tap position of the transformer by running the time-series power flow
+        of the whole time period for all possible tap positions in one batch of size
+        tap positions x timestamps.
+        Return the optimal tap position by the selected criterion:
+        * "energy_loss": the minimal total energy loss of all the lines and the whole time period.
+        * "voltage_deviation": the minimal (averaged across all nodes) deviation of (max and min)
+          p.u. node voltages with respect to 1 p.u.
+        """
+        if criterion not in ("energy_loss", "voltage_deviation"):
+            raise InvalidCriterionError("Criterion should be either energy_loss or voltage_deviation.")
+        transformer = self.input_data["transformer"]
+        tap_min = int(transformer["tap_min"][0])
+        tap_max = int(transformer["tap_max"][0])
+        tap_positions = np.arange(min(tap_min, tap_max), max(tap_min, tap_max) + 1)
+        n_timestamps = len(self.study_timestamps)
+
+        def update_data(positions: np.ndarray) -> BatchData:
+            with phase("update_data"):
+                update_transformer = initialize_array("update", "transformer", (len(positions) * n_timestamps, 1))
+                update_transformer["id"] = transformer["id"][0]
+                update_transformer["tap_pos"] = np.repeat(tap_positions[positions], n_timestamps)[:, np.newaxis]
+                return {
+                    "transformer": update_transformer,
+                    "sym_load": np.tile(self.load_profile, (len(positions), 1)),
+                }
+
+        scores = []
+        for _, output_data in self._calculate_scenarios(
+            "optimal_tap_position",
+            update_data,
+            {"line": ["p_from", "p_to"]} if criterion == "energy_loss" else {"node": ["u_pu"]},
+            {"tap_pos": tap_positions},
+        ):
+            with phase("aggregation"):
+                if criterion == "energy_loss":
+                    line_output = output_data["line"]
+                    scores.append(
+                        line_energy_loss(
+                            p_from=line_output["p_from"],
+                            p_to=line_output["p_to"],
+                            timestamps=self.active_load_profile.index,
+                            reduction=self.reduction,
+                        ).sum(axis=1)
+                    )
+                else:
+                    scores.append(voltage_deviation(u_pu=output_data["node"]["u_pu"]))
+        score = np.concatenate(scores)
+        if self.sink is not None:
+            self.sink.write_table(
+                "optimal_tap_position", pd.DataFrame({"tap_pos": tap_positions, "criterion": criterion, "score": score})
+            )
+        return int(tap_positions[np.argmin(score)])
+
+    @profiled("GridAnalysis.ev_penetration_level")
     def ev_penetration_level(self, penetration_level: int):
         """
         Given a (user-provided) input of electrical vehicle (EV) penetration level,
         i.e. the percentage of houses which has EV charged at home,
         randomly add EV charging profiles to the houses.
         Return 2 tables by using power_grid_modelling package.
+        The EV profiles are overlaid on the active load profile (see `ProfileOverlay`), which is left unchanged.
         """
         sym_load_ids_length = len(self.input_data["sym_load"]["id"])
         feeder_ids_length = len(self.feeder_ids)
         number_of_ev = floor(penetration_level * sym_load_ids_length / feeder_ids_length)
         ev_ids = []
         for _ in self.feeder_ids:
-            nodes_feeder = self.grid.find_downstream_vertices(_)
-            loads_feeder = []
-            for m in nodes_feeder:
-                if m in self.input_data["sym_load"]["node"]:
-                    load_idx = np.where(self.input_data["sym_load"]["node"] == m)
-                    loads_feeder.extend(list(self.input_data["sym_load"]["id"][load_idx]))
-            ev_ids.extend(random.sample(loads_feeder, number_of_ev))
-        ev_profiles = random.sample(list(self.ev_pool.columns), len(ev_ids))
-        for idx, val in enumerate(ev_profiles):
-            ev_prof = self.ev_pool.iloc[:, val]
-            self.active_load_profile[ev_ids[idx]] = self.active_load_profile[ev_ids[idx]] + ev_prof
+            ev_ids.extend(random.sample(self.feeder_load_ids[_].tolist(), number_of_ev))
+        ev_profiles = random.sample(range(len(self.ev_pool.columns)), len(ev_ids))
+        active_load_profile = ProfileOverlay(
+            self.active_load_profile,
+            self.ev_pool,
+            self.active_load_profile.columns.get_indexer(ev_ids),
+            ev_profiles,
+        )
         result = PowerGridModelling(
             data_path=self.input_data,
-            active_load_profile_path=self.active_load_profile,
+            active_load_profile_path=active_load_profile,
             reactive_load_profile_path=self.reactive_load_profile,
+            threading=self.threading,
+            processes=self.processes,
+            # the load profile was validated on construction, the overlay checks the EV profiles it reads
+            trusted=True,
+            cache=self.cache,
+            **self.calculation_options,
+            representatives=self.reduction,
+            model=self.model,
+            pool=self.pool,
+            sink=(
+                None
+                if self.sink is None
+                else self.sink.scoped("ev_penetration_level_", penetration_level=penetration_level)
+            ),
         )
         return result.data_per_timestamp(), result.data_per_line()
+
+    def _feeder_load_columns(self) -> List[np.ndarray]:
+        """
+        Positions in the load profile columns of the sym_loads downstream of each feeder
+        """
+        load_feeder_ids = pd.Series(self.load_feeder_ids, index=self.input_data["sym_load"]["id"])
+        profile_feeder_ids = load_feeder_ids[self.active_load_profile.columns].to_numpy()
+        return [np.flatnonzero(profile_feeder_ids == feeder_id) for feeder_id in self.feeder_ids]
+
+    def _number_of_ev(self, penetration_level: float) -> int:
+        """
+        Number of EVs per feeder: round_down[penetration_level * total_houses / number_of_feeders]
+        """
+        return floor(penetration_level * len(self.input_data["sym_load"]["id"]) / len(self.feeder_ids))
+
+    def _ev_ranking(self, n_samples: int, rng: np.random.Generator):
+        """
+        Draw per sample the order in which the houses of each feeder get an EV
+        and a distinct EV profile for every house (column of the load profile).
+        Taking the first houses of each ranking gives nested EV assignments across penetration levels.
+        """
+        feeder_ranking = [
+            columns[np.argsort(rng.random((n_samples, len(columns))), axis=1)]
+            for columns in self._feeder_load_columns()
+        ]
+        house_profiles = np.argsort(rng.random((n_samples, len(self.ev_pool.columns))), axis=1)
+        return feeder_ranking, house_profiles[:, : len(self.active_load_profile.columns)]
+
+    def _ev_batch_calculation(
+        self,
+        study: str,
+        feeder_ranking: List[np.ndarray],
+        house_profiles: np.ndarray,
+        numbers_of_ev: List[int],
+    ) -> Dict[str, np.ndarray]:
+        """
+        Run one batch calculation of size (samples x numbers_of_ev) x timestamps,
+        adding the EV profiles of the first houses of each feeder ranking to the active load profile.
+        Every scenario is kept as an overlay, its houses and their EV profiles, and the update data is only
+        built per chunk of scenarios, dense or sparse (see sparse_ev_update).
+        Return per scenario the maximum loading of every line and the minimum p.u. voltage of every node
+        across the timeline with the positions of their timestamps, and the line and node IDs.
+        """
+        if any(number_of_ev > ranking.shape[1] for ranking in feeder_ranking for number_of_ev in numbers_of_ev):
+            raise InvalidPenetrationLevelError("Number of EVs per feeder exceeds the number of houses in the feeder.")
+        scenarios = [
+            (sample, number_of_ev) for sample in range(house_profiles.shape[0]) for number_of_ev in numbers_of_ev
+        ]
+        scenario_columns = [
+            np.concatenate([ranking[sample, :number_of_ev] for ranking in feeder_ranking])
+            for sample, number_of_ev in scenarios
+        ]
+        scenario_profiles = [
+            house_profiles[sample, columns] for (sample, _), columns in zip(scenarios, scenario_columns)
+        ]
+        with phase("update_data"):
+            # only the EV profiles assigned in any scenario are read from the pool
+            used_profiles = np.unique(np.concatenate(scenario_profiles))
+            ev_pool = self.ev_pool.read(columns=used_profiles)
+            # the EV profiles are added to the validated load profile, PGM would treat NaN as "not updated"
+            if not np.isfinite(ev_pool).all():
+                raise InvalidProfilesError("EV profiles should only contain finite values.")
+            ev_pool = self._study_rows(ev_pool)
+            scenario_profiles = [np.searchsorted(used_profiles, profiles) for profiles in scenario_profiles]
+            base_changed = None
+            if self.sparse_ev_update:
+                # the loads whose profile differs from the input data are updated in every scenario
+                input_loads = self.input_data["sym_load"][
+                    pd.Index(self.input_data["sym_load"]["id"]).get_indexer(self.load_profile["id"][0])
+                ]
+                base_changed = (self.load_profile["p_specified"] != input_loads["p_specified"]) | (
+                    self.load_profile["q_specified"] != input_loads["q_specified"]
+                )
+
+        def update_data(positions: np.ndarray) -> BatchData:
+            with phase("update_data"):
+                load_profile = np.tile(self.load_profile, (len(positions), 1, 1))
+                for chunk_position, scenario in enumerate(positions):
+                    load_profile[chunk_position]["p_specified"][:, scenario_columns[scenario]] += ev_pool[
+                        :, scenario_profiles[scenario]
+                    ]
+                if not self.sparse_ev_update:
+                    return {"sym_load": load_profile.reshape(-1, load_profile.shape[-1])}
+                changed = np.tile(base_changed, (len(positions), 1, 1))
+                for chunk_position, scenario in enumerate(positions):
+                    changed[chunk_position][:, scenario_columns[scenario]] = True
+                return {
+                    "sym_load": sparse_batch(
+                        load_profile.reshape(-1, load_profile.shape[-1]), changed.reshape(-1, changed.shape[-1])
+                    )
+                }
+
+        extremes: Dict[str, List[np.ndarray]] = {
+            "max_loading": [],
+            "max_loading_timestamp": [],
+            "min_voltage": [],
+            "min_voltage_timestamp": [],
+        }
+        element_ids: Dict[str, np.ndarray] = {}
+        for _, output_data in self._calculate_scenarios(
+            study,
+            update_data,
+            {"node": ["u_pu"], "line": ["loading"]},
+            {
+                "sample": np.array([sample for sample, _ in scenarios]),
+                "number_of_ev": np.array([number_of_ev for _, number_of_ev in scenarios]),
+            },
+        ):
+            with phase("aggregation"):
+                loading = output_data["line"]["loading"]
+                u_pu = output_data["node"]["u_pu"]
+                timestamp_idx_max = np.argmax(loading, axis=1)
+                timestamp_idx_min = np.argmin(u_pu, axis=1)
+                extremes["max_loading"].append(np.take_along_axis(loading, timestamp_idx_max[:, np.newaxis], 1)[:, 0])
+                extremes["max_loading_timestamp"].append(timestamp_idx_max)
+                extremes["min_voltage"].append(np.take_along_axis(u_pu, timestamp_idx_min[:, np.newaxis], 1)[:, 0])
+                extremes["min_voltage_timestamp"].append(timestamp_idx_min)
+                element_ids.update(
+                    line_id=output_data["line"]["id"][0, 0, :], node_id=output_data["node"]["id"][0, 0, :]
+                )
+        return {**{name: np.concatenate(values) for name, values in extremes.items()}, **element_ids}
+
+    def _scenario_extremes(self, extremes: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        Maximum line loading and minimum node voltage of every scenario of an EV batch calculation,
+        with the IDs and timestamps where they occur
+        """
+        rows = np.arange(len(extremes["max_loading"]))
+        line_idx_max = np.argmax(extremes["max_loading"], axis=1)
+        node_idx_min = np.argmin(extremes["min_voltage"], axis=1)
+        timestamp_idx_max = extremes["max_loading_timestamp"][rows, line_idx_max]
+        timestamp_idx_min = extremes["min_voltage_timestamp"][rows, node_idx_min]
+        return pd.DataFrame(
+            data={
+                "Max_Loading": extremes["max_loading"][rows, line_idx_max],
+                "Max_Loading_Line_ID": extremes["line_id"][line_idx_max],
+                "Max_Loading_Timestamp": self.study_timestamps[timestamp_idx_max].to_numpy(),
+                "Min_Voltage": extremes["min_voltage"][rows, node_idx_min],
+                "Min_Voltage_Node_ID": extremes["node_id"][node_idx_min],
+                "Min_Voltage_Timestamp": self.study_timestamps[timestamp_idx_min].to_numpy(),
+            }
+        )
+
+    @profiled("GridAnalysis.ev_penetration_monte_carlo")
+    def ev_penetration_monte_carlo(
+        self,
+        penetration_level: float,
+        n_samples: int,
+        seed: int | None = None,
+        percentiles: List[float] | None = None,
+    ):
+        """
+        Monte Carlo version of the EV penetration level: draw n_samples random EV assignments
+        with a seeded NumPy generator, following the same rules as ev_penetration_level,
+        and run all of them in one batch calculation of size samples x timestamps.
+        Return 2 tables with the percentiles (default 5, 50 and 95) across the samples:
+        * per line (Line_ID index): maximum loading across the timeline
+        * per node (Node_ID index): minimum p.u. voltage across the timeline
+        """
+        percentiles = [5, 50, 95] if percentiles is None else percentiles
+        feeder_ranking, house_profiles = self._ev_ranking(n_samples=n_samples, rng=np.random.default_rng(seed))
+        extremes = self._ev_batch_calculation(
+            study="ev_penetration_monte_carlo",
+            feeder_ranking=feeder_ranking,
+            house_profiles=house_profiles,
+            numbers_of_ev=[self._number_of_ev(penetration_level)],
+        )
+        df_result_line = pd.DataFrame(
+            data={f"Max_Loading_P{p:g}": np.percentile(extremes["max_loading"], p, axis=0) for p in percentiles},
+            index=pd.Index(extremes["line_id"], name="Line_ID"),
+        )
+        df_result_node = pd.DataFrame(
+            data={f"Min_Voltage_P{p:g}": np.percentile(extremes["min_voltage"], p, axis=0) for p in percentiles},
+            index=pd.Index(extremes["node_id"], name="Node_ID"),
+        )
+        if self.sink is not None:
+            self.sink.write_table("ev_penetration_monte_carlo_per_line", df_result_line.reset_index())
+            self.sink.write_table("ev_penetration_monte_carlo_per_node", df_result_node.reset_index())
+        return df_result_line, df_result_node
+
+    @profiled("GridAnalysis.ev_penetration_sweep")
+    def ev_penetration_sweep(self, penetration_levels: List[float], seed: int | None = None) -> pd.DataFrame:
+        """
+        Evaluate a list of EV penetration levels in one batch calculation of size levels x timestamps.
+        One random EV assignment is drawn and the levels take nested subsets of it,
+        so a higher level only adds EVs to the houses of a lower level.
+        Return a table with one row per penetration level (index column) with the maximum line loading
+        and the minimum node voltage across the timeline, with their IDs and timestamps.
+        """
+        feeder_ranking, house_profiles = self._ev_ranking(n_samples=1, rng=np.random.default_rng(seed))
+        extremes = self._ev_batch_calculation(
+            study="ev_penetration_sweep",
+            feeder_ranking=feeder_ranking,
+            house_profiles=house_profiles,
+            numbers_of_ev=[self._number_of_ev(level) for level in penetration_levels],
+        )
+        df_result = self._scenario_extremes(extremes)
+        df_result.index = pd.Index(penetration_levels, name="Penetration_Level")
+        if self.sink is not None:
+            self.sink.write_table("ev_penetration_sweep", df_result.reset_index())
+        return df_result
+
+    @profiled("GridAnalysis.hosting_capacity")
+    def hosting_capacity(self, max_loading: float = 1.0, min_voltage: float = 0.95, seed: int | None = None) -> float:
+        """
+        Find the highest EV penetration level for which the maximum line loading stays within max_loading
+        and the minimum node voltage stays above min_voltage, by bisection on the number of EVs per feeder.
+        One random EV assignment is drawn and every step evaluates a nested subset of it on the same model.
+        Return the lowest penetration level giving that number of EVs per feeder
+        (0 if even the grid without EVs violates the limits).
+        """
+        feeder_ranking, house_profiles = self._ev_ranking(n_samples=1, rng=np.random.default_rng(seed))
+
+        def within_limits(number_of_ev: int) -> bool:
+            extremes = self._scenario_extremes(
+                self._ev_batch_calculation(
+                    study="hosting_capacity",
+                    feeder_ranking=feeder_ranking,
+                    house_profiles=house_profiles,
+                    numbers_of_ev=[number_of_ev],
+                )
+            )
+            return bool(extremes["Max_Loading"][0] <= max_loading and extremes["Min_Voltage"][0] >= min_voltage)
+
+        low, high = 0, min(ranking.shape[1] for ranking in feeder_ranking)
+        if not within_limits(low):
+            return 0.0
+        if within_limits(high):
+            low = high
+        while high - low > 1:
+            middle = (low + high) // 2
+            if within_limits(middle):
+                low = middle
+            else:
+                high = middle
+        return low * len(self.feeder_ids) / len(self.input_data["sym_load"]["id"])
@@ -0,0 +1,257 @@
+"""
+This module generates synthetic LV grids in PGM format, with matching load and EV profiles,
+to test and benchmark the package on grids of any size.
+
+The grids follow the structure of the assignment: one source and one MV/LV transformer,
+radial feeders from the LV busbar which are pairwise connected into rings by disconnected lines
+(`to_status` is `0`), so the base state is a tree.
+"""
+
+# pylint: disable=line-too-long,too-many-arguments,too-many-locals
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from power_grid_model import initialize_array
+from power_grid_model.utils import json_serialize_to_file
+
+# line parameters of a typical LV cable per km
+R_PER_KM = 0.206
+X_PER_KM = 0.08
+C_PER_KM = 0.4e-6
+I_N = 300.0
+
+
+def _transformer(transformer_id: int) -> np.ndarray:
+    """
+    A 630 kVA 10.75/0.42 kV transformer from the MV node 0 to the LV busbar node 1
+    """
+    transformer = initialize_array("input", "transformer", 1)
+    transformer["id"] = transformer_id
+    transformer["from_node"] = 0
+    transformer["to_node"] = 1
+    transformer["from_status"] = 1
+    transformer["to_status"] = 1
+    transformer["u1"] = 10750
+    transformer["u2"] = 420
+    transformer["sn"] = 630000
+    transformer["uk"] = 0.041
+    transformer["pk"] = 5200
+    transformer["i0"] = 0.01
+    transformer["p0"] = 745
+    transformer["winding_from"] = 2
+    transformer["winding_to"] = 1
+    transformer["clock"] = 5
+    transformer["tap_side"] = 0
+    transformer["tap_pos"] = 3
+    transformer["tap_min"] = 5
+    transformer["tap_max"] = 1
+    transformer["tap_nom"] = 3
+    transformer["tap_size"] = 250
+    return transformer
+
+
+def _lines(
+    first_id: int, from_nodes: List[int], to_nodes: List[int], to_status: np.ndarray, length_km: np.ndarray
+) -> np.ndarray:
+    """
+    LV cables with consecutive IDs between the given nodes
+    """
+    line = initialize_array("input", "line", len(from_nodes))
+    line["id"] = np.arange(first_id, first_id + len(from_nodes))
+    line["from_node"] = from_nodes
+    line["to_node"] = to_nodes
+    line["from_status"] = 1
+    line["to_status"] = to_status
+    line["r1"] = R_PER_KM * length_km
+    line["x1"] = X_PER_KM * length_km
+    line["c1"] = C_PER_KM * length_km
+    line["tan1"] = 0.0
+    line["r0"] = 4 * R_PER_KM * length_km
+    line["x0"] = 4 * X_PER_KM * length_km
+    line["c0"] = 0.6 * C_PER_KM * length_km
+    line["tan0"] = 0.0
+    line["i_n"] = I_N
+    return line
+
+
+def generate_lv_grid(
+    *,
+    n_feeders: int = 4,
+    nodes_per_feeder: int = 10,
+    n_open_points: int = 0,
+    load_probability: float = 0.7,
+    branch_probability: float = 0.2,
+    seed: int | None = None,
+) -> tuple[Dict[str, np.ndarray], Dict[str, object]]:
+    """
+    Generate a LV grid in PGM input format and its meta data
+    (MV source node, LV busbar, transformer ID, LV feeder IDs and source ID, like `meta_data.json`).
+    * Every feeder is a chain of nodes from the LV busbar, where each node is connected to the previous
+      node, or with branch_probability to a random earlier node of the same feeder.
+    * The last nodes of neighbouring feeders are connected by a disconnected line (open point),
+      plus n_open_points extra disconnected lines between random nodes of neighbouring feeders.
+    * Each LV node gets a sym_load with load_probability, and every feeder has at least one.
+    """
+    rng = np.random.default_rng(seed)
+    n_nodes = 2 + n_feeders * nodes_per_feeder
+    next_id = n_nodes
+    node = initialize_array("input", "node", n_nodes)
+    node["id"] = np.arange(n_nodes)
+    node["u_rated"] = 400
+    node["u_rated"][0] = 10500
+
+    source = initialize_array("input", "source", 1)
+    source["id"] = next_id
+    source["node"] = 0
+    source["status"] = 1
+    source["u_ref"] = 1.05
+    source["sk"] = 2e8
+    next_id += 1
+
+    transformer = _transformer(transformer_id=next_id)
+    next_id += 1
+
+    feeder_nodes = np.arange(2, n_nodes).reshape(n_feeders, nodes_per_feeder)
+    from_nodes: List[int] = []
+    to_nodes: List[int] = []
+    for nodes in feeder_nodes:
+        from_nodes.append(1)
+        to_nodes.append(nodes[0])
+        for position in range(1, nodes_per_feeder):
+            branch = rng.random() < branch_probability
+            from_nodes.append(nodes[rng.integers(position)] if branch else nodes[position - 1])
+            to_nodes.append(nodes[position])
+    n_tree_lines = len(from_nodes)
+    for feeder in range(n_feeders - 1):
+        from_nodes.append(feeder_nodes[feeder, -1])
+        to_nodes.append(feeder_nodes[feeder + 1, -1])
+    if n_feeders > 1:
+        for _ in range(n_open_points):
+            feeder = rng.integers(n_feeders - 1)
+            from_nodes.append(rng.choice(feeder_nodes[feeder]))
+            to_nodes.append(rng.choice(feeder_nodes[feeder + 1]))
+
+    line = _lines(
+        first_id=next_id,
+        from_nodes=from_nodes,
+        to_nodes=to_nodes,
+        to_status=np.arange(len(from_nodes)) < n_tree_lines,
+        length_km=rng.uniform(0.02, 0.06, len(from_nodes)),
+    )
+    next_id += len(line)
+    feeder_ids = line["id"][np.flatnonzero(line["from_node"][:n_tree_lines] == 1)].tolist()
+
+    has_load = rng.random(feeder_nodes.shape) < load_probability
+    has_load[np.arange(n_feeders), rng.integers(nodes_per_feeder, size=n_feeders)] = True
+    load_nodes = feeder_nodes[has_load]
+    sym_load = initialize_array("input", "sym_load", len(load_nodes))
+    sym_load["id"] = np.arange(next_id, next_id + len(load_nodes))
+    sym_load["node"] = load_nodes
+    sym_load["status"] = 1
+    sym_load["type"] = 0
+    sym_load["p_specified"] = 0
+    sym_load["q_specified"] = 0
+
+    dataset = {"node": node, "source": source, "transformer": transformer, "line": line, "sym_load": sym_load}
+    meta_data = {
+        "mv_source_node": 0,
+        "lv_busbar": 1,
+        "transformer": int(transformer["id"][0]),
+        "lv_feeders": feeder_ids,
+        "source": int(source["id"][0]),
+    }
+    return dataset, meta_data
+
+
+def generate_profiles(
+    sym_load_ids: np.ndarray,
+    n_timestamps: int,
+    *,
+    n_ev_profiles: int | None = None,
+    start: str = "2025-01-01",
+    freq: str = "15min",
+    seed: int | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Generate active and reactive household load profiles of the sym_loads (W and VAr),
+    and a pool of EV charging profiles (W), with timestamps as index.
+    * Household load follows a daily curve with morning and evening peaks, scaled and shifted per house,
+      with random noise. The reactive power follows from a random power factor between 0.9 and 1.
+    * Every EV charges once a day from a random evening arrival until its energy demand is met.
+    * By default there are as many EV profiles as sym_loads.
+    """
+    rng = np.random.default_rng(seed)
+    n_loads = len(sym_load_ids)
+    n_ev_profiles = n_loads if n_ev_profiles is None else n_ev_profiles
+    timestamps = pd.date_range(start=start, periods=n_timestamps, freq=freq, name="Timestamp")
+    elapsed_hours = ((timestamps - timestamps[0].floor("D")) / pd.Timedelta(hours=1)).to_numpy(dtype=np.float64)
+    hours = (elapsed_hours % 24)[:, np.newaxis]
+    shift = rng.uniform(-1, 1, n_loads)
+    daily = 0.3 + 0.5 * np.exp(-(((hours - 8 - shift) / 1.5) ** 2)) + np.exp(-(((hours - 19 - shift) / 2.0) ** 2))
+    scale = rng.uniform(500, 1500, n_loads)
+    p_load = scale * daily * rng.lognormal(0, 0.2, (n_timestamps, n_loads))
+    q_load = p_load * np.tan(np.arccos(rng.uniform(0.9, 1.0, n_loads)))
+    columns = pd.Index(sym_load_ids, name="Load ID")
+    active_load_profile = pd.DataFrame(p_load, index=timestamps, columns=columns)
+    reactive_load_profile = pd.DataFrame(q_load, index=timestamps, columns=columns)
+
+    step_hours = pd.Timedelta(freq) / pd.Timedelta(hours=1)
+    day = (elapsed_hours // 24).astype(int)[:, np.newaxis]
+    n_days = int(day.max()) + 1
+    arrival = rng.uniform(16, 22, (n_days, n_ev_profiles))
+    power = rng.choice([3700.0, 7400.0, 11000.0], n_ev_profiles)
+    duration = rng.uniform(2, 20, (n_days, n_ev_profiles)) * 1000 / power
+    charge_start = arrival[day, np.arange(n_ev_profiles)]
+    charge_stop = charge_start + duration[day, np.arange(n_ev_profiles)]
+    # evening charging wraps past midnight into the next day
+    wrapped_stop = np.vstack([np.zeros((int(round(24 / step_hours)), n_ev_profiles)), charge_stop - 24])[:n_timestamps]
+    charging = ((hours >= charge_start) & (hours < charge_stop)) | (hours < wrapped_stop)
+    ev_pool = pd.DataFrame(
+        charging * power,
+        index=timestamps,
+        columns=pd.Index(np.arange(n_ev_profiles), name="EV Profile Sequence Number"),
+    )
+    return active_load_profile, reactive_load_profile, ev_pool
+
+
+def write_lv_grid(
+    directory: str,
+    *,
+    n_feeders: int = 4,
+    nodes_per_feeder: int = 10,
+    n_timestamps: int = 96,
+    n_open_points: int = 0,
+    seed: int | None = None,
+) -> Dict[str, str]:
+    """
+    Generate a LV grid with its profiles and write them to a directory, with the file names
+    of the test data: input_network_data.json, meta_data.json, active_power_profile.parquet,
+    reactive_power_profile.parquet and ev_active_power_profile.parquet.
+    Return the paths of the files.
+    """
+    rng = np.random.default_rng(seed)
+    dataset, meta_data = generate_lv_grid(
+        n_feeders=n_feeders, nodes_per_feeder=nodes_per_feeder, n_open_points=n_open_points, seed=rng.integers(2**32)
+    )
+    active_load_profile, reactive_load_profile, ev_pool = generate_profiles(
+        sym_load_ids=dataset["sym_load"]["id"], n_timestamps=n_timestamps, seed=rng.integers(2**32)
+    )
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "data": str(path / "input_network_data.json"),
+        "meta_data": str(path / "meta_data.json"),
+        "active_load_profile": str(path / "active_power_profile.parquet"),
+        "reactive_load_profile": str(path / "reactive_power_profile.parquet"),
+        "ev_pool": str(path / "ev_active_power_profile.parquet"),
+    }
+    json_serialize_to_file(file_path=paths["data"], data=dataset)
+    with open(paths["meta_data"], "w", encoding="utf-8") as file:
+        json.dump(meta_data, file, indent=2)
+    active_load_profile.to_parquet(paths["active_load_profile"])
+    reactive_load_profile.to_parquet(paths["reactive_load_profile"])
+    ev_pool.to_parquet(paths["ev_pool"])
+    return paths
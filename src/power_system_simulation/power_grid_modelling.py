@@ -3,14 +3,24 @@ This class handles time series power flow calculation with a given input
 in PGM format and load profiles.
 """
 
-# pylint: disable=line-too-long
-from typing import Dict
+# pylint: disable=line-too-long,too-many-instance-attributes,too-many-locals,too-many-arguments,too-many-statements,too-many-branches
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, List
 
 import numpy as np
 import pandas as pd
+import power_grid_model
 from power_grid_model import CalculationMethod, CalculationType, PowerGridModel, initialize_array
 from power_grid_model.utils import json_deserialize_from_file
-from power_grid_model.validation import assert_valid_batch_data, assert_valid_input_data
+
+from power_system_simulation.profile_loading import ProfileOverlay, ProfileTable, fill_profile
+from power_system_simulation.profiling import annotate, phase, profiled
+from power_system_simulation.result_cache import ResultCache
+from power_system_simulation.result_sink import ParquetSink
+from power_system_simulation.timestamp_reduction import TimestampReduction
+from power_system_simulation.validation_cache import validate_batch_data, validate_input_data
 
 
 class InvalidProfilesError(Exception):
@@ -23,6 +33,513 @@ class InvalidProfilesError(Exception):
         print(error)
 
 
+class InvalidChunkSizeError(Exception):
+    """
+    Chunk size of the time series is invalid
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
+class InvalidCalculationMethodError(Exception):
+    """
+    Calculation method is not supported
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
+CALCULATION_METHODS = ("linear", "linear_current", "iterative_current", "newton_raphson", "auto")
+
+# the method tried first in auto mode, the scenarios it does not solve are re-solved with Newton-Raphson
+FAST_CALCULATION_METHOD = "iterative_current"
+
+# PGM 1.9 and newer only write the requested attributes, older versions write the full output rows
+ATTRIBUTE_FILTERING = hasattr(power_grid_model, "ComponentAttributeFilterOptions")
+
+# output component types, optionally with the attributes to keep per component
+OutputComponentTypes = List[str] | Dict[str, List[str]]
+# update data of a batch per component: a dense (batch x elements) array
+# or a sparse batch with indptr and data, holding only the updated elements of every scenario
+BatchData = Dict[str, np.ndarray | Dict[str, np.ndarray]]
+
+
+# the model of the input data of the pool, in a `ShardPool` worker process
+_WORKER: Dict[str, PowerGridModel] = {}
+
+
+def _initialize_worker(input_data: Dict[str, np.ndarray]) -> None:
+    """
+    Build the model of a `ShardPool` worker process once, when the process starts
+    """
+    _WORKER["model"] = PowerGridModel(input_data)
+
+
+def _calculate_shard(
+    update_data: BatchData,
+    output_component_types: OutputComponentTypes,
+    options: Dict[str, object],
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate one shard of a batch with the model of the worker process.
+    The processes are the parallelism, so every shard is calculated sequentially.
+    """
+    return _power_flow(_WORKER["model"], update_data, output_component_types, -1, options)
+
+
+class ShardPool:
+    """
+    Worker processes calculating the shards of the batch calculations on one input data:
+
+    * The owner (e.g. `GridAnalysis`) keeps the pool for all its calculations,
+        so the processes are started only once.
+    * Every worker builds the model of the input data once, when it starts.
+    * The shards are calculated sequentially in the workers, whatever the threading of the calculation,
+        so the processes never oversubscribe the cores with PGM threads.
+    * The pool is shut down by `close` (or as context manager), or else when it is garbage collected.
+    """
+
+    def __init__(self, input_data: Dict[str, np.ndarray], processes: int) -> None:
+        self.input_data = input_data
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes, initializer=_initialize_worker, initargs=(input_data,)
+        )
+        self._finalizer = weakref.finalize(self, self.executor.shutdown)
+
+    def __enter__(self) -> "ShardPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shut down the worker processes
+        """
+        self._finalizer()
+
+    def calculate(
+        self, update_data: BatchData, output_component_types: OutputComponentTypes, options: Dict[str, object]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Split the batch in contiguous shards along the batch axis, one per process,
+        calculate them in the workers and merge the outputs in order
+        """
+        batch_size = _batch_size(update_data)
+        shards = [shard for shard in np.array_split(np.arange(batch_size), self.processes) if len(shard)]
+        futures = [
+            self.executor.submit(
+                _calculate_shard,
+                batch_rows(update_data, slice(shard[0], shard[-1] + 1)),
+                output_component_types,
+                options,
+            )
+            for shard in shards
+        ]
+        outputs = [future.result() for future in futures]
+        if "failed_scenarios" in outputs[0]:
+            for shard, output in zip(shards, outputs):
+                output["failed_scenarios"] = output["failed_scenarios"] + shard[0]
+        return {component: np.concatenate([output[component] for output in outputs]) for component in outputs[0]}
+
+
+def _power_flow(
+    model: PowerGridModel,
+    update_data: BatchData,
+    output_component_types: OutputComponentTypes,
+    threading: int,
+    options: Dict[str, object],
+) -> Dict[str, np.ndarray]:
+    """
+    Batch power flow of the model. When the options continue on batch errors,
+    the positions of the failed scenarios are added to the output as failed_scenarios.
+    With attributes per component and/or an output dtype in the options, the output is compacted,
+    see `compact_output`.
+    """
+    options = dict(options)
+    output_dtype = options.pop("output_dtype", None)
+    attributes = output_component_types if isinstance(output_component_types, dict) else None
+    if attributes is not None:
+        output_component_types = (
+            {component: ["id", *names] for component, names in attributes.items()}
+            if ATTRIBUTE_FILTERING
+            else list(attributes)
+        )
+    output_data = model.calculate_power_flow(
+        update_data=update_data, output_component_types=output_component_types, threading=threading, **options
+    )
+    if attributes is not None or output_dtype is not None:
+        output_data = {
+            component: compact_output(output, None if attributes is None else attributes[component], output_dtype)
+            for component, output in output_data.items()
+        }
+    if options.get("continue_on_batch_error"):
+        batch_error = model.batch_error
+        output_data["failed_scenarios"] = (
+            np.empty(0, dtype=np.int64)
+            if batch_error is None
+            else np.asarray(batch_error.failed_scenarios, dtype=np.int64)
+        )
+    return output_data
+
+
+def compact_output(
+    output: np.ndarray | Dict[str, np.ndarray], attributes: List[str] | None, output_dtype: str | None
+) -> np.ndarray:
+    """
+    Structured array of the IDs and the given attributes (default all) of a PGM output, given either
+    as structured array or as columns, with the floating point attributes cast to output_dtype (e.g. float32)
+    """
+    columns = output if isinstance(output, dict) else {name: output[name] for name in output.dtype.names}
+    names = list(columns) if attributes is None else ["id", *[name for name in attributes if name != "id"]]
+    fields = [
+        (
+            name,
+            (
+                output_dtype
+                if output_dtype is not None and np.issubdtype(columns[name].dtype, np.floating)
+                else columns[name].dtype
+            ),
+        )
+        for name in names
+    ]
+    compact = np.empty(columns["id"].shape, dtype=fields)
+    for name in names:
+        compact[name] = columns[name]
+    return compact
+
+
+def _batch_size(update_data: BatchData) -> int:
+    update = next(iter(update_data.values()))
+    if isinstance(update, dict):
+        return len(update["indptr"]) - 1
+    return update.shape[0] if update.ndim == 2 else 1
+
+
+def batch_rows(update_data: BatchData, rows: slice | np.ndarray) -> BatchData:
+    """
+    The given scenarios (a slice or positions) of dense or sparse batch update data
+    """
+    selected = {}
+    for component, update in update_data.items():
+        if not isinstance(update, dict):
+            selected[component] = update[rows]
+            continue
+        indptr = update["indptr"]
+        positions = np.arange(len(indptr) - 1)[rows]
+        starts = indptr[positions]
+        counts = indptr[positions + 1] - starts
+        new_indptr = np.concatenate([[0], np.cumsum(counts)]).astype(indptr.dtype)
+        elements = np.repeat(starts - new_indptr[:-1], counts) + np.arange(new_indptr[-1])
+        selected[component] = {"indptr": new_indptr, "data": update["data"][elements]}
+    return selected
+
+
+def sparse_batch(update: np.ndarray, changed: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Sparse batch update of the changed elements (a boolean mask like update) of a dense
+    (batch x elements) update array. The elements left out keep their value of the input data.
+    """
+    indptr = np.concatenate([[0], np.cumsum(np.count_nonzero(changed, axis=1))]).astype(np.int64)
+    return {"indptr": indptr, "data": update[changed]}
+
+
+def _solver_options(
+    calculation_method: str | CalculationMethod, error_tolerance: float, max_iterations: int
+) -> Dict[str, object]:
+    """
+    PGM power flow options, only the iterative methods use the tolerance and iteration limit
+    """
+    method = calculation_method.name if isinstance(calculation_method, CalculationMethod) else calculation_method
+    options: Dict[str, object] = {"calculation_method": CalculationMethod[method]}
+    if method in ("iterative_current", "newton_raphson"):
+        options.update(error_tolerance=error_tolerance, max_iterations=max_iterations)
+    return options
+
+
+def calculate_batch(
+    input_data: Dict[str, np.ndarray],
+    update_data: BatchData,
+    output_component_types: OutputComponentTypes,
+    *,
+    threading: int = -1,
+    processes: int | None = None,
+    model: PowerGridModel | None = None,
+    pool: ShardPool | None = None,
+    cache: ResultCache | None = None,
+    calculation_method: str | CalculationMethod = "newton_raphson",
+    error_tolerance: float = 1e-8,
+    max_iterations: int = 20,
+    auto_max_iterations: int = 5,
+    output_dtype: str | np.dtype | None = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Run a batch power flow calculation.
+    * The update data of a component is a dense array or a sparse batch (see `sparse_batch`).
+    * The output component types are a list of components, or a mapping of components to the attributes
+      the caller uses: the output then only keeps the IDs and those attributes.
+    * With an output dtype (e.g. float32), the floating point attributes of the output are cast to it.
+    * threading is passed to PGM: -1 sequential, 0 all hardware threads, n threads.
+    * With more than one process, the batch is split in contiguous shards along the batch axis,
+      each shard is calculated in its own process and the outputs are merged in order.
+      The shards run in the given `ShardPool` of the input data, or else in a pool for this call only.
+    * The model is only used in the current process, workers build their own from the input data.
+    * With a result cache, the output is read from the cache if the same scenario was calculated before
+      and stored in it otherwise.
+    * The calculation method is one of linear, linear_current, iterative_current, newton_raphson or auto.
+      error_tolerance (p.u. voltage) and max_iterations apply to the iterative methods.
+    * auto first solves all scenarios with the iterative current method, which reuses one factorisation
+      of the admittance matrix, limited to auto_max_iterations. Only the scenarios which do not reach
+      error_tolerance within that limit are re-solved with Newton-Raphson.
+    * Inside a `Profiler` the calculation is recorded as a phase with its batch size and settings.
+    """
+    method = calculation_method.name if isinstance(calculation_method, CalculationMethod) else calculation_method
+    if method not in CALCULATION_METHODS:
+        raise InvalidCalculationMethodError(f"Calculation method should be one of {', '.join(CALCULATION_METHODS)}.")
+    output_options = {} if output_dtype is None else {"output_dtype": np.dtype(output_dtype).name}
+    with (
+        phase(
+            "calculate_batch",
+            batch_size=_batch_size(update_data),
+            calculation_method=method,
+            error_tolerance=error_tolerance,
+            max_iterations=max_iterations,
+            threading=threading,
+            processes=processes,
+        ),
+        ExitStack() as stack,
+    ):
+        if processes is None or processes <= 1:
+            pool = None
+        elif pool is None or pool.input_data is not input_data or pool.processes != processes:
+            pool = stack.enter_context(ShardPool(input_data, processes))
+        execution = {"threading": threading, "pool": pool, "model": model, "cache": cache}
+        if method != "auto":
+            return _calculate_batch(
+                input_data,
+                update_data,
+                output_component_types,
+                options={**_solver_options(method, error_tolerance, max_iterations), **output_options},
+                **execution,
+            )
+        output_data = _calculate_batch(
+            input_data,
+            update_data,
+            output_component_types,
+            options={
+                **_solver_options(FAST_CALCULATION_METHOD, error_tolerance, auto_max_iterations),
+                **output_options,
+                "continue_on_batch_error": True,
+            },
+            **execution,
+        )
+        resolved = output_data.pop("failed_scenarios")
+        annotate(resolved_scenarios=len(resolved))
+        if len(resolved):
+            exact_data = _calculate_batch(
+                input_data,
+                batch_rows(update_data, resolved),
+                output_component_types,
+                options={**_solver_options("newton_raphson", error_tolerance, max_iterations), **output_options},
+                **execution,
+            )
+            for component, output in output_data.items():
+                output[resolved] = exact_data[component]
+        return output_data
+
+
+def _calculate_batch(
+    input_data: Dict[str, np.ndarray],
+    update_data: BatchData,
+    output_component_types: OutputComponentTypes,
+    *,
+    options: Dict[str, object],
+    threading: int,
+    pool: ShardPool | None,
+    model: PowerGridModel | None,
+    cache: ResultCache | None,
+) -> Dict[str, np.ndarray]:
+    if cache is not None:
+        key = ResultCache.key(
+            input_data=input_data,
+            update_data=update_data,
+            options={
+                **{
+                    name: value.name if isinstance(value, CalculationMethod) else value
+                    for name, value in options.items()
+                },
+                "output_component_types": (
+                    sorted((component, sorted(names)) for component, names in output_component_types.items())
+                    if isinstance(output_component_types, dict)
+                    else sorted(output_component_types)
+                ),
+            },
+        )
+        output_data = cache.get(key)
+        annotate(cache_hit=output_data is not None)
+        if output_data is None:
+            output_data = _calculate_batch(
+                input_data,
+                update_data,
+                output_component_types,
+                options=options,
+                threading=threading,
+                pool=pool,
+                model=model,
+                cache=None,
+            )
+            cache.put(key, output_data)
+        return output_data
+    if pool is not None:
+        return pool.calculate(update_data, output_component_types, options)
+    if model is None:
+        model = PowerGridModel(input_data)
+    return _power_flow(model, update_data, output_component_types, threading, options)
+
+
+def line_energy_loss(
+    p_from: np.ndarray, p_to: np.ndarray, timestamps: pd.DatetimeIndex, reduction: TimestampReduction | None = None
+) -> np.ndarray:
+    """
+    Energy loss in kWh of every line, integrated with the trapezoidal rule over the
+    timestamp axis (the second last axis) using the real timestamp spacing.
+    The power arrays have the shape (..., timestamps, lines).
+    With a reduction the timestamp axis holds the representative timestamps,
+    which are weighted by the timestamps of the timeline they stand for.
+    """
+    # integrated in double precision, also for single precision outputs
+    p_loss = np.abs(np.abs(np.asarray(p_from, dtype=np.float64)) - np.abs(p_to))
+    if reduction is not None:
+        return np.einsum("...tl,t->...l", p_loss, reduction.energy_weights(timestamps)) / 1000
+    hours = ((timestamps - timestamps[0]) / pd.Timedelta(hours=1)).to_numpy(dtype=np.float64)
+    return np.trapz(p_loss, x=hours, axis=-2) / 1000
+
+
+def voltage_deviation(u_pu: np.ndarray) -> np.ndarray:
+    """
+    Deviation of the maximum and minimum p.u. voltage of every node across the timeline
+    with respect to 1 p.u., averaged across all nodes.
+    The voltage array has the shape (..., timestamps, nodes).
+    """
+    u_max_deviation = np.abs(np.max(u_pu, axis=-2) - 1)
+    u_min_deviation = np.abs(np.min(u_pu, axis=-2) - 1)
+    return np.mean((u_max_deviation + u_min_deviation) / 2, axis=-1)
+
+
+class TimestampAggregator:
+    """
+    Online reducer of the node output into the table per timestamp.
+    Node output is fed chunk by chunk, only the reduced values are kept.
+    """
+
+    def __init__(self) -> None:
+        self.u_max: List[np.ndarray] = []
+        self.node_max: List[np.ndarray] = []
+        self.u_min: List[np.ndarray] = []
+        self.node_min: List[np.ndarray] = []
+
+    def update(self, node_output: np.ndarray) -> None:
+        """
+        Reduce a chunk of node output with the shape (timestamps, nodes)
+        """
+        u_pu = node_output["u_pu"]
+        arr_node_id = node_output["id"][0, :]
+        rows = np.arange(u_pu.shape[0])
+        u_idx_max = np.argmax(u_pu, axis=1)
+        u_idx_min = np.argmin(u_pu, axis=1)
+        self.u_max.append(u_pu[rows, u_idx_max])
+        self.node_max.append(arr_node_id[u_idx_max])
+        self.u_min.append(u_pu[rows, u_idx_min])
+        self.node_min.append(arr_node_id[u_idx_min])
+
+    def result(self, timestamps: pd.DatetimeIndex, chunks: slice = slice(None)) -> pd.DataFrame:
+        """
+        Table per timestamp of all the chunks fed so far, or of the given slice of chunks
+        """
+        df_result_node = pd.DataFrame(
+            data={
+                "Max_Voltage": np.concatenate(self.u_max[chunks]),
+                "Max_Voltage_Node": np.concatenate(self.node_max[chunks]),
+                "Min_Voltage": np.concatenate(self.u_min[chunks]),
+                "Min_Voltage_Node": np.concatenate(self.node_min[chunks]),
+            },
+            index=timestamps,
+        )
+        df_result_node.index.name = "Timestamp"
+        return df_result_node
+
+
+class LineAggregator:
+    """
+    Online reducer of the line output into the table per line.
+    Keeps the running maximum and minimum loading with their timestamps and the energy loss,
+    carrying the last timestamp of a chunk over so the trapezoid across the chunk boundary is included.
+    """
+
+    def __init__(self) -> None:
+        self.line_ids: np.ndarray | None = None
+        self.total_loss: np.ndarray | None = None
+        self.max_loading: np.ndarray | None = None
+        self.max_timestamp: np.ndarray | None = None
+        self.min_loading: np.ndarray | None = None
+        self.min_timestamp: np.ndarray | None = None
+        self.last_output: np.ndarray | None = None
+        self.last_timestamp: pd.DatetimeIndex | None = None
+
+    def update(self, line_output: np.ndarray, timestamps: pd.DatetimeIndex) -> None:
+        """
+        Reduce a chunk of line output with the shape (timestamps, lines)
+        """
+        loading = line_output["loading"]
+        columns = np.arange(loading.shape[1])
+        loading_idx_max = np.argmax(loading, axis=0)
+        loading_idx_min = np.argmin(loading, axis=0)
+        chunk_max = loading[loading_idx_max, columns]
+        chunk_min = loading[loading_idx_min, columns]
+        if self.last_output is None:
+            self.line_ids = line_output["id"][0, :]
+            self.total_loss = line_energy_loss(line_output["p_from"], line_output["p_to"], timestamps)
+            self.max_loading, self.min_loading = chunk_max, chunk_min
+            self.max_timestamp = timestamps[loading_idx_max].to_numpy()
+            self.min_timestamp = timestamps[loading_idx_min].to_numpy()
+        else:
+            carried_output = np.concatenate([self.last_output, line_output])
+            self.total_loss += line_energy_loss(
+                carried_output["p_from"], carried_output["p_to"], self.last_timestamp.append(timestamps)
+            )
+            # strict comparison keeps the first timestamp of equal extremes, like argmax/argmin
+            new_max = chunk_max > self.max_loading
+            new_min = chunk_min < self.min_loading
+            self.max_loading = np.where(new_max, chunk_max, self.max_loading)
+            self.min_loading = np.where(new_min, chunk_min, self.min_loading)
+            self.max_timestamp = np.where(new_max, timestamps[loading_idx_max].to_numpy(), self.max_timestamp)
+            self.min_timestamp = np.where(new_min, timestamps[loading_idx_min].to_numpy(), self.min_timestamp)
+        self.last_output = line_output[-1:]
+        self.last_timestamp = timestamps[-1:]
+
+    def result(self) -> pd.DataFrame:
+        """
+        Table per line of all the chunks fed so far
+        """
+        df_result_line = pd.DataFrame(
+            data={
+                "Total_Loss": self.total_loss,
+                "Max_Loading": self.max_loading,
+                "Max_Loading_Timestamp": self.max_timestamp,
+                "Min_Loading": self.min_loading,
+                "Min_Loading_Timestamp": self.min_timestamp,
+            },
+            index=self.line_ids,
+        )
+        df_result_line.index.name = "Line_ID"
+        return df_result_line
+
+
 class PowerGridModelling:
     """
     Input is as follow:
@@ -30,55 +547,193 @@ class PowerGridModelling:
     * A power grid in PGM input format
     * A table containing active load profile of all the `sym_load`
         in the grid, with timestamps and load ids.
+        Given as a parquet path it is read column by column from the memory mapped file
+        into the PGM update array, and kept as a lazy `ProfileTable`.
+        A `ProfileOverlay` (e.g. with EV profiles added) is filled chunk by chunk as well.
     * A table containing reactive load profile of all the `sym_load`
         in the grid, with timestamps and load ids.
     * The above two tables has the same number of rows and columns.
         The timestamps and load ids will be matching.
+    * Optionally a chunk size: the time series is then calculated in chunks of this many
+        timestamps and each chunk is reduced into the aggregation tables right away,
+        so only the tables are kept in memory and `output_data` is `None`.
+    * Optionally the execution backend: the number of PGM threads (`threading`) and the number
+        of worker processes the timestamps of each chunk are sharded over (`processes`).
+    * Validations are cached by fingerprint of the data. With `trusted` the load profile update
+        data is not validated at all, for callers which have already validated the same data.
+    * Optionally a `ResultCache`: the output of every chunk is then read from or stored in it.
+    * Optionally the calculation method (default Newton-Raphson), its error tolerance and iteration limit,
+        and the iteration limit of the fast pass of the auto method, see `calculate_batch`.
+    * Optionally an output dtype (e.g. float32) the kept output attributes are cast to.
+        Only u_pu of the nodes and p_from, p_to and loading of the lines are kept.
+    * Optionally a number of representatives (or a prepared `TimestampReduction` of the timeline):
+        the load snapshots are then clustered into this many representative timestamps,
+        only those are calculated and their results are mapped back to the timeline.
+        The table per timestamp keeps a row per timestamp of the timeline, the extremes per line are
+        reported at the representative timestamps. `output_data` holds the representative timestamps
+        and `reduction` the mapping and the reduction error.
+    * Optionally a `ParquetSink`: the rows of the table per timestamp (and with raw output the
+        node and line output) are then written as each chunk finishes, the table per line at the end.
+    * Optionally a `PowerGridModel` built from the power grid, which is then used instead of building one.
+        The batch calculations leave the model unchanged, so callers can share one model across calculations.
+    * Optionally a `ShardPool` of the power grid the chunks are sharded over with more than one process.
+        Without one, a pool is started for the construction and shut down at its end.
+    * Inside a `Profiler` the construction and the tables are recorded as phases.
     """
 
+    @profiled("PowerGridModelling")
     def __init__(
         self,
         data_path: str | Dict[str, np.ndarray | Dict[str, np.ndarray]],
-        active_load_profile_path: str | pd.DataFrame,
+        active_load_profile_path: str | pd.DataFrame | ProfileOverlay,
         reactive_load_profile_path: str | pd.DataFrame,
+        *,
+        chunk_size: int | None = None,
+        threading: int = -1,
+        processes: int | None = None,
+        trusted: bool = False,
+        cache: ResultCache | None = None,
+        calculation_method: str | CalculationMethod = "newton_raphson",
+        error_tolerance: float = 1e-8,
+        max_iterations: int = 20,
+        auto_max_iterations: int = 5,
+        representatives: int | TimestampReduction | None = None,
+        reduction_seed: int | None = None,
+        sink: ParquetSink | None = None,
+        output_dtype: str | np.dtype | None = None,
+        model: PowerGridModel | None = None,
+        pool: ShardPool | None = None,
     ) -> None:
+        if chunk_size is not None and chunk_size < 1:
+            raise InvalidChunkSizeError("Chunk size should be at least 1.")
         if isinstance(data_path, str):
-            dataset = json_deserialize_from_file(data_path)
-            assert_valid_input_data(input_data=dataset, calculation_type=CalculationType.power_flow)
+            with phase("deserialize"):
+                dataset = json_deserialize_from_file(data_path)
+            with phase("validate_input"):
+                validate_input_data(input_data=dataset, calculation_type=CalculationType.power_flow)
         else:
             dataset = data_path
-        if isinstance(active_load_profile_path, str):
-            active_load_profile = pd.read_parquet(active_load_profile_path)
-        else:
-            active_load_profile = active_load_profile_path
-        if isinstance(reactive_load_profile_path, str):
-            reactive_load_profile = pd.read_parquet(reactive_load_profile_path)
-        else:
-            reactive_load_profile = reactive_load_profile_path
+        with phase("read_profiles"):
+            if isinstance(active_load_profile_path, str):
+                active_load_profile = ProfileTable(active_load_profile_path)
+            else:
+                active_load_profile = active_load_profile_path
+            if isinstance(reactive_load_profile_path, str):
+                reactive_load_profile = ProfileTable(reactive_load_profile_path)
+            else:
+                reactive_load_profile = reactive_load_profile_path
         if not active_load_profile.index.equals(reactive_load_profile.index):
             raise InvalidProfilesError("Load profiles should have matching timestamps.")
-        model = PowerGridModel(dataset)
-        profile = initialize_array("update", "sym_load", active_load_profile.shape)
-        profile["id"] = active_load_profile.columns.to_numpy()
-        profile["p_specified"] = active_load_profile.to_numpy()
-        profile["q_specified"] = reactive_load_profile.to_numpy()
-        update_dataset = {"sym_load": profile}
-        input_data = dataset
-        update_data = update_dataset
-        calculation_type = CalculationType.power_flow
-        assert_valid_batch_data(input_data=input_data, update_data=update_data, calculation_type=calculation_type)
-
-        output_data = model.calculate_power_flow(
-            update_data=update_dataset,
-            calculation_method=CalculationMethod.newton_raphson,
-            output_component_types=["node", "line"],
-        )
+        if len(active_load_profile.index) == 0:
+            raise InvalidProfilesError("Load profiles should contain at least one timestamp.")
+        if model is None:
+            with phase("model_construction"):
+                model = PowerGridModel(dataset)
+        with ExitStack() as stack:
+            if processes is not None and processes > 1 and pool is None:
+                # one pool for all the chunks, the workers build their model once; shut down on errors too
+                pool = stack.enter_context(ShardPool(dataset, processes))
+            n_timestamps = len(active_load_profile.index)
+            n_loads = len(active_load_profile.columns)
+            step = n_timestamps if chunk_size is None else chunk_size
+            timestamp_aggregator = TimestampAggregator()
+            line_aggregator = LineAggregator()
+
+            def calculate(update_dataset: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+                if not trusted:
+                    with phase("validate_batch"):
+                        validate_batch_data(
+                            input_data=dataset, update_data=update_dataset, calculation_type=CalculationType.power_flow
+                        )
+                return calculate_batch(
+                    input_data=dataset,
+                    update_data=update_dataset,
+                    output_component_types={"node": ["u_pu"], "line": ["p_from", "p_to", "loading"]},
+                    threading=threading,
+                    processes=processes,
+                    model=model,
+                    pool=pool,
+                    cache=cache,
+                    calculation_method=calculation_method,
+                    error_tolerance=error_tolerance,
+                    max_iterations=max_iterations,
+                    auto_max_iterations=auto_max_iterations,
+                    output_dtype=output_dtype,
+                )
+
+            def write_chunk(timestamps: pd.DatetimeIndex) -> None:
+                if sink is not None:
+                    with phase("sink"):
+                        sink.write_table(
+                            "data_per_timestamp",
+                            timestamp_aggregator.result(timestamps, chunks=slice(-1, None)).reset_index(),
+                        )
+
+            reduction = representatives if isinstance(representatives, TimestampReduction) else None
+            output_data = None
+            if representatives is None:
+                for start in range(0, n_timestamps, step):
+                    chunk = slice(start, start + step)
+                    with phase("update_data"):
+                        profile = initialize_array(
+                            "update", "sym_load", (len(active_load_profile.index[chunk]), n_loads)
+                        )
+                        profile["id"] = active_load_profile.columns.to_numpy()
+                        fill_profile(active_load_profile, profile["p_specified"], rows=chunk)
+                        fill_profile(reactive_load_profile, profile["q_specified"], rows=chunk)
+                    output_data = calculate({"sym_load": profile})
+                    with phase("aggregation"):
+                        timestamp_aggregator.update(output_data["node"])
+                        line_aggregator.update(output_data["line"], active_load_profile.index[chunk])
+                    write_chunk(active_load_profile.index[chunk])
+                    if sink is not None:
+                        sink.write_output("output", output_data, active_load_profile.index[chunk])
+            else:
+                with phase("update_data"):
+                    snapshots = np.empty((n_timestamps, 2 * n_loads))
+                    fill_profile(active_load_profile, snapshots[:, :n_loads])
+                    fill_profile(reactive_load_profile, snapshots[:, n_loads:])
+                if reduction is None:
+                    with phase("reduction"):
+                        reduction = TimestampReduction(snapshots, representatives, seed=reduction_seed)
+                        annotate(timestamps=n_timestamps, representatives=len(reduction.representatives))
+                with phase("update_data"):
+                    profile = initialize_array("update", "sym_load", (len(reduction.representatives), n_loads))
+                    profile["id"] = active_load_profile.columns.to_numpy()
+                    profile["p_specified"] = snapshots[reduction.representatives, :n_loads]
+                    profile["q_specified"] = snapshots[reduction.representatives, n_loads:]
+                output_data = calculate({"sym_load": profile})
+                if sink is not None:
+                    sink.write_output("output", output_data, active_load_profile.index[reduction.representatives])
+                for start in range(0, n_timestamps, step):
+                    chunk = slice(start, start + step)
+                    with phase("aggregation"):
+                        timestamp_aggregator.update(reduction.expand(output_data["node"], rows=chunk))
+                        line_aggregator.update(
+                            reduction.expand(output_data["line"], rows=chunk), active_load_profile.index[chunk]
+                        )
+                    write_chunk(active_load_profile.index[chunk])
+                # the extremes are reported at the representative timestamps, which were calculated
+                timestamps = active_load_profile.index
+                calculated = timestamps[reduction.representatives][reduction.assignment]
+                line_aggregator.max_timestamp = calculated[
+                    timestamps.get_indexer(line_aggregator.max_timestamp)
+                ].to_numpy()
+                line_aggregator.min_timestamp = calculated[
+                    timestamps.get_indexer(line_aggregator.min_timestamp)
+                ].to_numpy()
+        if sink is not None:
+            sink.write_table("data_per_line", line_aggregator.result().reset_index())
         self.model = model
-        self.output_data = output_data
+        self.output_data = output_data if chunk_size is None else None
+        self.reduction = reduction
         self.active_load_profile = active_load_profile
         self.reactive_load_profile = reactive_load_profile
         self.timestamps = active_load_profile.index
+        self.timestamp_aggregator = timestamp_aggregator
+        self.line_aggregator = line_aggregator
 
+    @profiled("PowerGridModelling.data_per_timestamp")
     def data_per_timestamp(self) -> pd.DataFrame:
         """
         A table with each row representing a timestamp, with the following columns:
@@ -88,67 +743,19 @@ class PowerGridModelling:
         * Minimum p.u. voltage of all the nodes for this timestamp
         * The node ID with the minimum p.u. voltage
         """
-        df_u_pu = pd.DataFrame(self.output_data["node"]["u_pu"])
-        arr_node_id = self.output_data["node"]["id"][0, :]
-        u_idx_max = np.argmax(df_u_pu, axis=1)
-        u_max = np.max(df_u_pu, axis=1)
-        u_idx_min = np.argmin(df_u_pu, axis=1)
-        u_min = np.min(df_u_pu, axis=1)
-        max_node_id = []
-        min_node_id = []
-        for n in u_idx_max:
-            max_node_id.append(arr_node_id[n])
-        for m in u_idx_min:
-            min_node_id.append(arr_node_id[m])
-        df_result_node = pd.DataFrame(
-            data={
-                "Max_Voltage": u_max.to_numpy(),
-                "Max_Voltage_Node": max_node_id,
-                "Min_Voltage": u_min.to_numpy(),
-                "Min_Voltage_Node": min_node_id,
-            },
-            index=self.timestamps,
-        )
-        df_result_node.index.name = "Timestamp"
-        return df_result_node
+        return self.timestamp_aggregator.result(self.timestamps)
 
+    @profiled("PowerGridModelling.data_per_line")
     def data_per_line(self) -> pd.DataFrame:
         """
         A table with each row representing a line, with the following columns:
         * Line ID (index column)
         * Energy loss of the line across the timeline in kWh
         * You need to use the descrete numerical integral with [Trapezoidal rule]
-        (https://en.wikipedia.org/wiki/Trapezoidal_rule).
+        (https://en.wikipedia.org/wiki/Trapezoidal_rule), using the real timestamp spacing in hours.
         * Maximum loading in p.u. of the line across the whole timeline
         * Timestamp of this maximum loading moment
         * Minimum loading in p.u. of the line across the whole timeline
         * Timestamp of this minimum loading moment
         """
-        df_p_from = abs(pd.DataFrame(self.output_data["line"]["p_from"]))
-        df_p_to = abs(pd.DataFrame(self.output_data["line"]["p_to"]))
-        df_p_loss = abs(df_p_from - df_p_to)
-        p_loss = []
-        for x in range(0, len(self.output_data["line"]["id"][0])):
-            p_loss.append(np.trapz(list(df_p_loss[x])) / 1000)
-        df_loading_pu = pd.DataFrame(self.output_data["line"]["loading"])
-        arr_line_id = self.output_data["line"]["id"][0, :]
-        loading_idx_max = np.argmax(df_loading_pu, axis=0)
-        loading_idx_min = np.argmin(df_loading_pu, axis=0)
-        max_line_timestamp = []
-        min_line_timestamp = []
-        for n in loading_idx_max:
-            max_line_timestamp.append(self.timestamps[n])
-        for m in loading_idx_min:
-            min_line_timestamp.append(self.timestamps[m])
-        df_result_line = pd.DataFrame(
-            data={
-                "Total_Loss": p_loss,
-                "Max_loading": np.max(df_loading_pu, axis=0).to_numpy(),
-                "Max_Loading_Timestamp": max_line_timestamp,
-                "Min_Loading": np.min(df_loading_pu, axis=0).to_numpy(),
-                "Min_Loading_Timestamp": min_line_timestamp,
-            },
-            index=arr_line_id,
-        )
-        df_result_line.index.name = "Line_ID"
-        return df_result_line
+        return self.line_aggregator.result()
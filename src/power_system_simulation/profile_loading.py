@@ -0,0 +1,178 @@
+"""
+This module reads load profiles and EV profiles from parquet files through pyarrow,
+with column projection and memory mapping, without materialising them as DataFrames.
+"""
+
+# pylint: disable=line-too-long
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+class InvalidProfilesError(Exception):
+    """
+    Invalid profile values
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
+class ProfileTable:
+    """
+    Lazy view of a profile parquet file written by pandas:
+    timestamps as index and one column per load ID (or EV profile).
+
+    Only the index and the column labels are read on construction.
+    The values are read per requested column from the memory mapped file,
+    straight into the destination array. Only the row groups which overlap the requested
+    timestamps are read, and the last decoded row group is kept until its last row is read,
+    so reading a file in consecutive chunks of timestamps decodes every row group once
+    and nothing is kept once the file is read to the end.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.file = pq.ParquetFile(path, memory_map=True)
+        schema = self.file.schema_arrow
+        index_fields = [field for field in schema.pandas_metadata["index_columns"] if isinstance(field, str)]
+        # the empty table restores the original column labels and index dtype from the pandas metadata
+        self.columns = schema.empty_table().to_pandas().columns
+        self.index = self.file.read(columns=index_fields).to_pandas().index
+        self.fields = [name for name in schema.names if name not in index_fields]
+        self.path = path
+        metadata = self.file.metadata
+        # first row of every row group, and the number of rows at the end
+        self.row_group_starts = np.cumsum(
+            [0] + [metadata.row_group(group).num_rows for group in range(metadata.num_row_groups)]
+        )
+        self.decoded: tuple[int, tuple[int, ...], list[np.ndarray]] | None = None
+
+    def _row_group(self, group: int, positions: tuple[int, ...]) -> list[np.ndarray]:
+        """
+        Values of the given column positions in a row group, decoded once for consecutive reads
+        """
+        if self.decoded is None or self.decoded[:2] != (group, positions):
+            table = self.file.read_row_group(group, columns=[self.fields[position] for position in positions])
+            self.decoded = (group, positions, [column.to_numpy() for column in table.columns])
+        return self.decoded[2]
+
+    @property
+    def shape(self):
+        """
+        (timestamps, columns), like a DataFrame
+        """
+        return len(self.index), len(self.columns)
+
+    def fill(self, out: np.ndarray, rows: slice = slice(None), columns: np.ndarray | None = None) -> None:
+        """
+        Fill out (rows x columns) with the values of the given column positions (default all)
+        for the given slice of timestamps. out may be a field of a structured array.
+        """
+        positions = tuple(range(len(self.fields)) if columns is None else (int(column) for column in columns))
+        start, stop, _ = rows.indices(len(self.index))
+        starts = self.row_group_starts
+        first_group = np.searchsorted(starts, start, side="right") - 1
+        for group in range(first_group, np.searchsorted(starts, stop, side="left")):
+            group_start, group_stop = max(start, starts[group]), min(stop, starts[group + 1])
+            values = self._row_group(group, positions)
+            for idx, column in enumerate(values):
+                out[group_start - start : group_stop - start, idx] = column[
+                    group_start - starts[group] : group_stop - starts[group]
+                ]
+            if group_stop == starts[group + 1]:
+                # the row group is read to its end, consecutive reads continue in the next one
+                self.decoded = None
+
+    def read(self, columns: np.ndarray | None = None, rows: slice = slice(None)) -> np.ndarray:
+        """
+        Values of the given column positions (default all) as a (timestamps x columns) array
+        """
+        n_rows = len(range(*rows.indices(len(self.index))))
+        n_columns = len(self.fields) if columns is None else len(columns)
+        out = np.empty((n_rows, n_columns))
+        self.fill(out, rows=rows, columns=columns)
+        return out
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        The whole profile as a DataFrame
+        """
+        return pd.DataFrame(self.read(), index=self.index, columns=self.columns)
+
+
+class ProfileOverlay:
+    """
+    Lazy sum of a base profile and columns of a profile pool added to some of its columns,
+    e.g. the active load profile with the EV charging profiles added to the houses with an EV.
+
+    Only the positions of the overlaid columns are kept, the base profile is not copied
+    or changed. The pool columns are read when the overlay is filled into an array,
+    for the requested slice of timestamps only, and checked to be finite then.
+    """
+
+    def __init__(
+        self,
+        base: "pd.DataFrame | ProfileTable | ProfileOverlay",
+        pool: pd.DataFrame | ProfileTable,
+        columns: np.ndarray,
+        pool_columns: np.ndarray,
+    ) -> None:
+        """
+        The pool column pool_columns[i] is added to the base column at position columns[i],
+        the positions in columns are distinct
+        """
+        self.base = base
+        self.pool = pool
+        self.overlay_columns = np.asarray(columns, dtype=np.int64)
+        self.pool_columns = np.asarray(pool_columns, dtype=np.int64)
+        self.index = base.index
+        self.columns = base.columns
+
+    @property
+    def shape(self):
+        """
+        (timestamps, columns), like a DataFrame
+        """
+        return len(self.index), len(self.columns)
+
+    def fill(self, out: np.ndarray, rows: slice = slice(None)) -> None:
+        """
+        Fill out (rows x columns) with the base profile plus the overlaid pool columns
+        for the given slice of timestamps. out may be a field of a structured array.
+        """
+        fill_profile(self.base, out, rows=rows)
+        if len(self.overlay_columns):
+            pool = np.empty((len(range(*rows.indices(len(self.index)))), len(self.pool_columns)))
+            fill_profile(self.pool, pool, rows=rows, columns=self.pool_columns)
+            if not np.isfinite(pool).all():
+                raise InvalidProfilesError("EV profiles should only contain finite values.")
+            out[:, self.overlay_columns] += pool
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        The whole profile as a DataFrame
+        """
+        out = np.empty(self.shape)
+        self.fill(out)
+        return pd.DataFrame(out, index=self.index, columns=self.columns)
+
+
+def fill_profile(
+    profile: pd.DataFrame | ProfileTable | ProfileOverlay,
+    out: np.ndarray,
+    rows: slice = slice(None),
+    columns: np.ndarray | None = None,
+) -> None:
+    """
+    Fill out with the values of the given column positions (default all) of a profile
+    given as a DataFrame, a ProfileTable or a ProfileOverlay (all columns only)
+    """
+    if isinstance(profile, ProfileOverlay):
+        profile.fill(out, rows=rows)
+    elif isinstance(profile, ProfileTable):
+        profile.fill(out, rows=rows, columns=columns)
+    elif columns is None:
+        out[...] = profile.iloc[rows].to_numpy()
+    else:
+        out[...] = profile.iloc[rows, columns].to_numpy()
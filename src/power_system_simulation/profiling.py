@@ -0,0 +1,152 @@
+"""
+This module records the wall time, peak memory and calculation details of the phases of a study
+(deserialisation, validation, graph construction, batch calculations, aggregation, ...).
+
+Recording is enabled by running the study inside a `Profiler` context. Outside of it every phase
+is a shared no-op context, so the instrumentation costs a single check when it is disabled.
+"""
+
+# pylint: disable=line-too-long
+import functools
+import time
+import tracemalloc
+from contextlib import nullcontext
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+_profilers: List["Profiler"] = []
+_DISABLED = nullcontext()
+
+
+class _Phase:
+    """
+    One running phase of the active profiler
+    """
+
+    def __init__(self, profiler: "Profiler", name: str, info: Dict[str, object]) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.info = info
+        self.start = 0.0
+        self.memory_start = 0
+        self.memory_peak = 0
+        self.record: Dict[str, object] = {}
+
+    def __enter__(self) -> "_Phase":
+        profiler = self.profiler
+        if profiler.memory:
+            # keep the peak of the enclosing phases before the peak is reset for this one
+            current, peak = tracemalloc.get_traced_memory()
+            for running in profiler.running:
+                running.memory_peak = max(running.memory_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = self.memory_peak = current
+        # records are added when the phase starts, so the report lists phases in start order
+        self.record = {
+            "phase": "/".join([running.name for running in profiler.running] + [self.name]),
+            "depth": len(profiler.running),
+            "seconds": None,
+        }
+        profiler.records.append(self.record)
+        profiler.running.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self.start
+        profiler = self.profiler
+        profiler.running.pop()
+        self.record["seconds"] = seconds
+        if profiler.memory:
+            self.record["peak_memory_bytes"] = (
+                max(self.memory_peak, tracemalloc.get_traced_memory()[1]) - self.memory_start
+            )
+        self.record.update(self.info)
+
+
+class Profiler:
+    """
+    Context in which the phases of all studies are recorded:
+
+    * Every phase gets a record with its path of enclosing phases, its wall time in seconds
+      and the details the phase annotated, such as the PGM batch size and calculation settings.
+    * With memory, the peak of the Python and NumPy allocations (tracemalloc) during every phase
+      is recorded too. Tracing memory slows down the study, so it is off by default.
+    * Profilers can be nested, phases are recorded in the innermost one.
+    """
+
+    def __init__(self, memory: bool = False) -> None:
+        self.memory = memory
+        self.records: List[Dict[str, object]] = []
+        self.running: List[_Phase] = []
+        self._started_tracing = False
+
+    def __enter__(self) -> "Profiler":
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _profilers.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _profilers.remove(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self) -> pd.DataFrame:
+        """
+        A table with one row per recorded phase in the order they started, with the columns
+        phase, depth, seconds, peak_memory_bytes (with memory) and the annotated details
+        """
+        return pd.DataFrame(self.records)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        A table with one row per phase path (index column) with the number of calls,
+        the total seconds and the largest peak memory (with memory)
+        """
+        report = pd.DataFrame(self.records)
+        if report.empty:
+            return pd.DataFrame(columns=["calls", "seconds"], index=pd.Index([], name="phase"))
+        aggregation = {"calls": ("seconds", "size"), "seconds": ("seconds", "sum")}
+        if self.memory:
+            aggregation["peak_memory_bytes"] = ("peak_memory_bytes", "max")
+        return report.groupby("phase", sort=False).agg(**aggregation)
+
+
+def phase(name: str, **info):
+    """
+    Context recording a phase with optional details (e.g. batch_size) in the active profiler,
+    a no-op without active profiler
+    """
+    if not _profilers:
+        return _DISABLED
+    return _Phase(_profilers[-1], name, info)
+
+
+def annotate(**info) -> None:
+    """
+    Add details to the innermost running phase of the active profiler, a no-op without active profiler
+    """
+    if _profilers and _profilers[-1].running:
+        _profilers[-1].running[-1].info.update(info)
+
+
+def profiled(name: str) -> Callable:
+    """
+    Decorator recording every call of the function as a phase
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _profilers:
+                return function(*args, **kwargs)
+            with _Phase(_profilers[-1], name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
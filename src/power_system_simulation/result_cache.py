@@ -0,0 +1,108 @@
+"""
+This module stores power flow batch outputs on disk, keyed by a hash of the input data,
+the update data and the calculation options,
+so a repeated study is read back instead of recalculated.
+"""
+
+# pylint: disable=line-too-long
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from power_system_simulation.validation_cache import dataset_fingerprint
+
+
+class ResultCache:
+    """
+    Content addressed cache of batch outputs in a local directory, one npz file per scenario hash.
+    The total size of the directory is bounded: when it is exceeded, the least recently used
+    files are removed first. Reading a file marks it as recently used.
+    Several processes can share the directory: every write goes through its own temporary file,
+    and files removed by another process are skipped.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(
+        input_data: Dict[str, np.ndarray],
+        update_data: Dict[str, np.ndarray | Dict[str, np.ndarray]],
+        options: Dict[str, object],
+    ) -> str:
+        """
+        Hash of the input data, the update data and the calculation options
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(dataset_fingerprint(input_data).encode())
+        digest.update(dataset_fingerprint(update_data).encode())
+        digest.update(repr(sorted(options.items())).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+    def get(self, key: str) -> Dict[str, np.ndarray] | None:
+        """
+        Stored output of the scenario, or None if it is not in the cache
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                output_data = {component: stored[component] for component in stored.files}
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            pass
+        return output_data
+
+    def put(self, key: str, output_data: Dict[str, np.ndarray]) -> None:
+        """
+        Store the output of the scenario and evict the least recently used files above the size limit
+        """
+        # a unique temporary file per write, so concurrent writers of the same key never share it
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                np.savez(file, **output_data)
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            Path(temporary_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used files until the cache fits in max_bytes
+        """
+        files = []
+        # temporary files of writes in progress end with .tmp and are never evicted
+        for file in self.directory.glob("*.npz"):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file))
+        files.sort(key=lambda entry: entry[0])
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, file in files:
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= size
+            file.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """
+        Remove all the stored outputs
+        """
+        for file in self.directory.glob("*.npz"):
+            file.unlink(missing_ok=True)
@@ -0,0 +1,106 @@
+"""
+This module writes study results incrementally into partitioned parquet datasets,
+so results are on disk as soon as each batch chunk is calculated.
+"""
+
+# pylint: disable=line-too-long
+import uuid
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class ParquetSink:
+    """
+    Sink of result tables into a directory with one parquet dataset per table:
+    <directory>/<prefix><table>/<partition>=<value>/.../part-<sink>-<n>-<i>.parquet
+
+    * Every write appends new files to the dataset, partitioned (hive style) by the given
+      scenario values and, for tables with a Timestamp column, by the date of the timestamps.
+    * With raw_output the raw PGM outputs of the batches are written too, one row per
+      scenario, timestamp and component, see `write_output`.
+    * `scoped` gives a sink into the same directory with a table name prefix and/or
+      partition values added to every write.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        raw_output: bool = False,
+        prefix: str = "",
+        partitions: Dict[str, object] | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.raw_output = raw_output
+        self.prefix = prefix
+        self.partitions = partitions or {}
+        # file names are unique per sink and write, so sinks in several processes can share the directory
+        self.token = uuid.uuid4().hex[:12]
+        self.counter = [0]
+
+    def scoped(self, prefix: str = "", **partitions) -> "ParquetSink":
+        """
+        Sink into the same directory, with the prefix appended to the table name prefix
+        and the partition values added to every write
+        """
+        sink = ParquetSink(self.directory, self.raw_output, self.prefix + prefix, {**self.partitions, **partitions})
+        sink.token = self.token
+        # the counter is shared, so the files of scoped sinks never collide
+        sink.counter = self.counter
+        return sink
+
+    def path(self, table: str) -> Path:
+        """
+        Directory of the dataset of a table
+        """
+        return self.directory / f"{self.prefix}{table}"
+
+    def write_table(self, table: str, data: pd.DataFrame, partitions: Dict[str, object] | None = None) -> None:
+        """
+        Append a table to its dataset. Partitions are constant values or arrays aligned with the rows.
+        """
+        columns = {**self.partitions, **(partitions or {})}
+        data = data.assign(**columns)
+        partition_cols = list(columns)
+        if "Timestamp" in data.columns:
+            data["date"] = data["Timestamp"].dt.strftime("%Y-%m-%d")
+            partition_cols.append("date")
+        self.counter[0] += 1
+        pq.write_to_dataset(
+            pa.Table.from_pandas(data, preserve_index=False),
+            root_path=str(self.path(table)),
+            partition_cols=partition_cols or None,
+            basename_template=f"part-{self.token}-{self.counter[0]:06d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def write_output(
+        self,
+        table: str,
+        output_data: Dict[str, np.ndarray],
+        timestamps: pd.DatetimeIndex,
+        scenarios: Dict[str, np.ndarray] | None = None,
+    ) -> None:
+        """
+        Append the raw batch output of every component to the dataset <table>_<component>
+        when the sink writes raw output. The output has the shape (timestamps, elements), or
+        (scenarios, timestamps, elements) with the scenario values given per scenario, e.g. the tap position,
+        which partition the dataset. Every output attribute becomes a column next to the Timestamp.
+        """
+        if not self.raw_output:
+            return
+        for component, output in output_data.items():
+            batch = output.reshape(-1, len(timestamps), output.shape[-1])
+            n_scenarios, n_timestamps, n_elements = batch.shape
+            columns = {"Timestamp": np.tile(np.repeat(timestamps.to_numpy(), n_elements), n_scenarios)}
+            columns.update({attribute: batch[attribute].reshape(-1) for attribute in batch.dtype.names})
+            partitions = {
+                name: np.repeat(np.asarray(values), n_timestamps * n_elements)
+                for name, values in (scenarios or {}).items()
+            }
+            self.write_table(f"{table}_{component}", pd.DataFrame(columns), partitions=partitions)
@@ -0,0 +1,183 @@
+"""
+This module reduces a long timeline of load snapshots to representative timestamps.
+
+The snapshots (one row per timestamp with the active, reactive and EV power of all profiles)
+are clustered with k-means. Every cluster is represented by its medoid, the real timestamp
+closest to the cluster centre, so only real snapshots are calculated. The results of a
+representative are mapped back to every timestamp of its cluster.
+"""
+
+# pylint: disable=line-too-long,too-many-locals
+import numpy as np
+import pandas as pd
+
+# rows of snapshots per distance calculation, bounds the memory of the distance matrix
+_DISTANCE_ROWS = 4096
+# the k-means++ seeding draws the centers from a random sample of this many snapshots per cluster
+_SEEDING_SAMPLE = 4
+
+
+class InvalidRepresentativesError(Exception):
+    """
+    Number of representative timestamps is invalid
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+        print(error)
+
+
+def _nearest(features: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """
+    Position of the nearest center (squared Euclidean distance) of every row of features
+    """
+    center_norms = np.einsum("ij,ij->i", centers, centers)
+    labels = np.empty(len(features), dtype=np.int64)
+    for start in range(0, len(features), _DISTANCE_ROWS):
+        rows = features[start : start + _DISTANCE_ROWS]
+        # the norm of the row is the same for every center, so it is left out of the comparison
+        labels[start : start + _DISTANCE_ROWS] = np.argmin(center_norms - 2 * rows @ centers.T, axis=1)
+    return labels
+
+
+def _initial_centers(features: np.ndarray, n_clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    k-means++ seeding: every next center is drawn with a probability proportional to the
+    squared distance to the nearest center drawn so far.
+    Seeding costs a pass over the features per center, so it runs on a random sample of them.
+    """
+    if len(features) > _SEEDING_SAMPLE * n_clusters:
+        features = features[np.sort(rng.choice(len(features), _SEEDING_SAMPLE * n_clusters, replace=False))]
+    norms = np.einsum("ij,ij->i", features, features)
+    positions = np.empty(n_clusters, dtype=np.int64)
+    positions[0] = rng.integers(len(features))
+    distance = np.maximum(norms - 2 * features @ features[positions[0]] + norms[positions[0]], 0)
+    draws = rng.random(n_clusters)
+    for cluster in range(1, n_clusters):
+        cumulative = np.cumsum(distance)
+        if cumulative[-1] == 0:
+            # all snapshots coincide with a center: any snapshot will do
+            positions[cluster] = int(draws[cluster] * len(features))
+        else:
+            positions[cluster] = min(np.searchsorted(cumulative, draws[cluster] * cumulative[-1]), len(features) - 1)
+        center = positions[cluster]
+        np.minimum(distance, np.maximum(norms - 2 * features @ features[center] + norms[center], 0), out=distance)
+    return features[positions]
+
+
+def _cluster_sums(features: np.ndarray, labels: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The non-empty clusters with the sum and number of their rows of features
+    """
+    order = np.argsort(labels, kind="stable")
+    clusters, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+    return clusters, np.add.reduceat(features[order], starts, axis=0), counts
+
+
+def _kmeans(
+    features: np.ndarray, n_clusters: int, rng: np.random.Generator, max_iterations: int, tolerance: float
+) -> np.ndarray:
+    """
+    Lloyd's k-means, return the cluster of every row of features.
+    Stops when at most a tolerance fraction of the rows changes cluster.
+    The distances are calculated in single precision, which halves the cost of the matrix products.
+    """
+    features = features.astype(np.float32)
+    centers = _initial_centers(features, n_clusters, rng)
+    labels = _nearest(features, centers)
+    for _ in range(max_iterations):
+        clusters, sums, counts = _cluster_sums(features, labels)
+        # empty clusters keep their center
+        centers[clusters] = sums / counts[:, np.newaxis]
+        new_labels = _nearest(features, centers)
+        changed = np.count_nonzero(new_labels != labels)
+        labels = new_labels
+        if changed <= tolerance * len(features):
+            break
+    return labels
+
+
+def trapezoid_weights(timestamps: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Weight in hours of every timestamp in the trapezoidal integral over the timeline,
+    so that the integral of values is `weights @ values`
+    """
+    hours = ((timestamps - timestamps[0]) / pd.Timedelta(hours=1)).to_numpy(dtype=np.float64)
+    weights = np.zeros(len(hours))
+    spacing = np.diff(hours) / 2
+    weights[:-1] += spacing
+    weights[1:] += spacing
+    return weights
+
+
+class TimestampReduction:
+    """
+    Reduction of a timeline to representative timestamps, input:
+
+    * The snapshots: an array (timestamps x features), e.g. the active and reactive power
+        of all loads side by side, in W and VAr.
+    * The number of representative timestamps. With at least as many as timestamps
+        every timestamp represents itself.
+    * Optionally a seed of the random k-means++ seeding, the iteration limit of k-means and its
+        tolerance: the fraction of timestamps which may still change cluster when k-means stops.
+
+    The reduction provides:
+    * representatives: positions of the representative timestamps in the timeline, in timeline order
+    * assignment: for every timestamp the position of its representative in representatives
+    * weights: the number of timestamps every representative stands for
+    * the reduction error of the snapshots mapped back to the timeline:
+        rms_error (root mean square error relative to the root mean square of the snapshots),
+        max_error (largest absolute error, in the unit of the snapshots) and
+        peak_error (relative error of the peak of the total of all features).
+    """
+
+    def __init__(
+        self,
+        snapshots: np.ndarray,
+        n_representatives: int,
+        seed: int | None = None,
+        max_iterations: int = 50,
+        tolerance: float = 1e-2,
+    ) -> None:
+        if n_representatives < 1:
+            raise InvalidRepresentativesError("Number of representative timestamps should be at least 1.")
+        snapshots = np.asarray(snapshots, dtype=np.float64)
+        n_timestamps = len(snapshots)
+        if n_representatives >= n_timestamps:
+            representatives = np.arange(n_timestamps)
+            assignment = np.arange(n_timestamps)
+        else:
+            labels = _kmeans(snapshots, n_representatives, np.random.default_rng(seed), max_iterations, tolerance)
+            clusters, sums, counts = _cluster_sums(snapshots, labels)
+            labels = np.searchsorted(clusters, labels)
+            # the medoid of every cluster: the member closest to the mean of the cluster
+            centers = sums / counts[:, np.newaxis]
+            distance = np.sum((snapshots - centers[labels]) ** 2, axis=1)
+            order = np.lexsort((distance, labels))
+            medoids = order[np.searchsorted(labels[order], np.arange(len(clusters)))]
+            timeline_order = np.argsort(medoids)
+            representatives = medoids[timeline_order]
+            assignment = np.argsort(timeline_order)[labels]
+        self.representatives = representatives
+        self.assignment = assignment
+        self.weights = np.bincount(assignment, minlength=len(representatives))
+        error = snapshots - snapshots[representatives][assignment]
+        scale = np.sqrt(np.mean(snapshots**2)) if snapshots.size else 0.0
+        self.rms_error = float(np.sqrt(np.mean(error**2)) / scale) if scale > 0 else 0.0
+        self.max_error = float(np.max(np.abs(error))) if error.size else 0.0
+        peak = np.max(snapshots.sum(axis=1)) if snapshots.size else 0.0
+        reduced_peak = np.max(snapshots[representatives].sum(axis=1)) if snapshots.size else 0.0
+        self.peak_error = float(abs(peak - reduced_peak) / abs(peak)) if peak != 0 else 0.0
+
+    def expand(self, values: np.ndarray, rows: slice = slice(None)) -> np.ndarray:
+        """
+        Values of the representatives (representatives x ...) mapped back to the given slice of the timeline
+        """
+        return values[self.assignment[rows]]
+
+    def energy_weights(self, timestamps: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Weight in hours of every representative in the trapezoidal integral over the original timeline,
+        so that the integral of the values mapped back to the timeline is `energy_weights @ values`
+        """
+        return np.bincount(self.assignment, weights=trapezoid_weights(timestamps), minlength=len(self.representatives))
@@ -0,0 +1,83 @@
+"""
+This module wraps the PGM input and batch data validation with a cache of successful validations,
+keyed by a fingerprint of the arrays, so the same data is only validated once per process.
+"""
+
+# pylint: disable=line-too-long
+import hashlib
+from collections import OrderedDict
+from typing import Dict
+
+import numpy as np
+from power_grid_model import CalculationType
+from power_grid_model.validation import assert_valid_batch_data, assert_valid_input_data
+
+CACHE_SIZE = 256
+
+_validated: OrderedDict = OrderedDict()
+
+
+def dataset_fingerprint(dataset: Dict[str, np.ndarray | Dict[str, np.ndarray]]) -> str:
+    """
+    Hash of the component names, dtypes, shapes and field values of all the arrays in a (batch) dataset
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for component in sorted(dataset):
+        data = dataset[component]
+        arrays = sorted(data.items()) if isinstance(data, dict) else [("", data)]
+        for name, array in arrays:
+            digest.update(f"{component}/{name}/{array.dtype.descr}/{array.shape}".encode())
+            # hash field by field, the padding bytes of aligned structured arrays are not initialised
+            for field in array.dtype.names or [None]:
+                values = np.ascontiguousarray(array if field is None else array[field])
+                digest.update(values.reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+
+def _is_validated(key: str) -> bool:
+    if key in _validated:
+        _validated.move_to_end(key)
+        return True
+    return False
+
+
+def _remember(key: str) -> None:
+    _validated[key] = None
+    if len(_validated) > CACHE_SIZE:
+        _validated.popitem(last=False)
+
+
+def validate_input_data(
+    input_data: Dict[str, np.ndarray],
+    calculation_type: CalculationType = CalculationType.power_flow,
+) -> None:
+    """
+    assert_valid_input_data, skipped if the same input data passed before
+    """
+    key = f"input/{calculation_type}/{dataset_fingerprint(input_data)}"
+    if _is_validated(key):
+        return
+    assert_valid_input_data(input_data=input_data, calculation_type=calculation_type)
+    _remember(key)
+
+
+def validate_batch_data(
+    input_data: Dict[str, np.ndarray],
+    update_data: Dict[str, np.ndarray | Dict[str, np.ndarray]],
+    calculation_type: CalculationType = CalculationType.power_flow,
+) -> None:
+    """
+    assert_valid_batch_data, skipped if the same input and update data passed before
+    """
+    key = f"batch/{calculation_type}/{dataset_fingerprint(input_data)}/{dataset_fingerprint(update_data)}"
+    if _is_validated(key):
+        return
+    assert_valid_batch_data(input_data=input_data, update_data=update_data, calculation_type=calculation_type)
+    _remember(key)
+
+
+def clear_validation_cache() -> None:
+    """
+    Forget all successful validations
+    """
+    _validated.clear()
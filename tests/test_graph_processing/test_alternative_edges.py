@@ -61,3 +61,20 @@ def test_no_possible_solution():
         source_vertex_id=source_id,
     )
     assert data.find_alternative_edges(disabled_edge_id=9) == []
+
+
+def test_all_alternative_edges():
+    edge_ids = [1, 3, 5, 7, 8, 9]
+    edge_vertex_id = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]
+    source_id = 0
+    data = GraphProcessor(
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id,
+        edge_enabled=edge_enabled,
+        source_vertex_id=source_id,
+    )
+    result = data.find_all_alternative_edges()
+    assert result == {1: [7], 3: [7, 8], 5: [8], 9: []}
+    for edge_id, alternatives in result.items():
+        assert data.find_alternative_edges(disabled_edge_id=edge_id) == alternatives
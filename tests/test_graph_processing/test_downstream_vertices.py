@@ -45,3 +45,35 @@ def test_edge_already_disabled_downstream():
         source_vertex_id=source_id,
     )
     assert data.find_downstream_vertices(edge_id=7) == []
+
+
+def test_downstream_vertices_subtree():
+    edge_ids = [1, 3, 5, 7, 8, 9]
+    edge_vertex_id = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]
+    source_id = 0
+    data = GraphProcessor(
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id,
+        edge_enabled=edge_enabled,
+        source_vertex_id=source_id,
+    )
+    assert data.find_downstream_vertices(edge_id=1) == [2, 10]
+    assert data.find_downstream_vertices(edge_id=9) == [10]
+    assert data.find_downstream_vertices(edge_id=5) == [6]
+
+
+def test_downstream_labels():
+    edge_ids = [1, 3, 5, 7, 8, 9]
+    edge_vertex_id = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]
+    source_id = 0
+    data = GraphProcessor(
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id,
+        edge_enabled=edge_enabled,
+        source_vertex_id=source_id,
+    )
+    # vertex order is 0, 2, 4, 6, 10
+    assert data.find_downstream_labels(edge_ids=[9, 1, 5]).tolist() == [-1, 1, -1, 5, 9]
+    assert data.find_downstream_labels(edge_ids=[7]).tolist() == [-1, -1, -1, -1, -1]
@@ -2,6 +2,8 @@
 Tests for assignment 1
 """
 
+import networkx as nx
+import numpy as np
 import pytest
 
 from power_system_simulation.graph_processing import (
@@ -12,6 +14,7 @@ from power_system_simulation.graph_processing import (
     IDNotUniqueError,
     InputLengthDoesNotMatchError,
 )
+from power_system_simulation.grid_generator import generate_lv_grid
 
 
 def test_2_ID_not_unique():
@@ -117,3 +120,36 @@ def test_graph_cycles():
             source_vertex_id=source_id,
         )
     assert str(error.value) == "Grid should be acyclic."
+
+
+def test_parallel_edges_cycle():
+    with pytest.raises(GraphCycleError) as error:
+        GraphProcessor(
+            edge_ids=[1, 3, 5],
+            edge_vertex_id_pairs=[(0, 2), (2, 4), (2, 4)],
+            edge_enabled=[True, True, True],
+            source_vertex_id=0,
+        )
+    assert str(error.value) == "Grid should be acyclic."
+
+
+def test_generated_grid_matches_networkx():
+    dataset, _ = generate_lv_grid(n_feeders=6, nodes_per_feeder=40, n_open_points=12, seed=11)
+    line = dataset["line"]
+    edge_vertex_id = np.column_stack([line["from_node"], line["to_node"]])
+    enabled = line["to_status"].astype(bool)
+    network = GraphProcessor(
+        edge_ids=line["id"], edge_vertex_id_pairs=edge_vertex_id, edge_enabled=enabled, source_vertex_id=1
+    )
+    tree = network.network
+    assert nx.is_tree(tree)
+    for edge_id, (first, second) in zip(line["id"][enabled], edge_vertex_id[enabled]):
+        child = second if nx.shortest_path_length(tree, 1, first) < nx.shortest_path_length(tree, 1, second) else first
+        expected = nx.node_connected_component(nx.restricted_view(tree, [], [(first, second)]), child)
+        assert set(network.find_downstream_vertices(edge_id)) == expected
+    meshed = enabled.copy()
+    meshed[np.flatnonzero(~enabled)[0]] = True
+    with pytest.raises(GraphCycleError):
+        GraphProcessor(line["id"], edge_vertex_id, meshed, 1)
+    with pytest.raises(GraphNotFullyConnectedError):
+        GraphProcessor(line["id"], edge_vertex_id, np.zeros(len(line), dtype=bool), 1)
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from power_system_simulation.graph_processing import (
+    EdgeAlreadyDisabledError,
+    EdgeAlreadyEnabledError,
+    GraphCycleError,
+    GraphNotFullyConnectedError,
+    GraphProcessor,
+)
+from power_system_simulation.grid_analytic import graph_creator
+from power_system_simulation.grid_generator import generate_lv_grid
+
+edge_ids = [1, 3, 5, 7, 8, 9]
+edge_vertex_id = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+edge_enabled = [True, True, True, False, False, True]
+
+
+def grid():
+    return GraphProcessor(
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id,
+        edge_enabled=edge_enabled,
+        source_vertex_id=0,
+    )
+
+
+def test_swap_edge():
+    network = grid()
+    network.swap_edge(disabled_edge_id=1, enabled_edge_id=7)
+    assert network.find_downstream_vertices(edge_id=3) == [4, 2, 10]
+    assert network.find_downstream_vertices(edge_id=1) == []
+    assert network.find_alternative_edges(disabled_edge_id=7) == [1]
+    assert network.find_all_alternative_edges() == {3: [1, 8], 5: [8], 7: [1], 9: []}
+
+
+def test_swap_edge_keeps_input():
+    status = np.array(edge_enabled)
+    network = GraphProcessor(
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id,
+        edge_enabled=status,
+        source_vertex_id=0,
+    )
+    network.swap_edge(disabled_edge_id=1, enabled_edge_id=7)
+    network.disable_edge(edge_id=3)
+    np.testing.assert_array_equal(status, edge_enabled)
+
+
+def test_disable_and_enable_edge():
+    network = grid()
+    network.disable_edge(edge_id=3)
+    with pytest.raises(GraphNotFullyConnectedError) as error:
+        network.find_downstream_vertices(edge_id=1)
+    assert str(error.value) == "Grid should be fully connected."
+    network.enable_edge(edge_id=8)
+    assert network.find_downstream_vertices(edge_id=5) == [6, 4]
+
+
+def test_invalid_switching():
+    network = grid()
+    with pytest.raises(GraphCycleError) as error:
+        network.swap_edge(disabled_edge_id=5, enabled_edge_id=7)
+    assert str(error.value) == "Grid should be acyclic."
+    # the failed swap is rolled back
+    assert network.find_all_alternative_edges() == grid().find_all_alternative_edges()
+    with pytest.raises(EdgeAlreadyEnabledError) as error:
+        network.enable_edge(edge_id=1)
+    assert str(error.value) == "Edge is already enabled."
+    with pytest.raises(EdgeAlreadyDisabledError) as error:
+        network.disable_edge(edge_id=7)
+    assert str(error.value) == "Edge is already disabled."
+
+
+def test_switching_sequence_matches_rebuild():
+    dataset, _ = generate_lv_grid(n_feeders=4, nodes_per_feeder=15, n_open_points=10, seed=3)
+    network = graph_creator(dataset)
+    rng = np.random.default_rng(5)
+    for _ in range(50):
+        alternatives = {edge: options for edge, options in network.find_all_alternative_edges().items() if options}
+        disabled = list(alternatives)[rng.integers(len(alternatives))]
+        network.swap_edge(disabled_edge_id=disabled, enabled_edge_id=rng.choice(alternatives[disabled]))
+    rebuilt = GraphProcessor(
+        edge_ids=network.edge_ids,
+        edge_vertex_id_pairs=network.edge_vertex_id_pairs,
+        edge_enabled=network.edge_enabled.tolist(),
+        source_vertex_id=network.source_vertex_id,
+    )
+    assert network.find_all_alternative_edges() == rebuilt.find_all_alternative_edges()
+    for edge_id in network.edge_ids:
+        assert sorted(network.find_downstream_vertices(edge_id)) == sorted(rebuilt.find_downstream_vertices(edge_id))
+    assert np.array_equal(network.depth, rebuilt.depth)
@@ -1,8 +1,11 @@
+import json
+
 import numpy as np
 import pytest
 from power_grid_model.utils import json_deserialize_from_file, json_serialize_to_file
 
 from power_system_simulation.grid_analytic import GridAnalysis, IDNotFoundError, LineNotFullyConnectedError
+from power_system_simulation.grid_generator import write_lv_grid
 
 data_path = "tests/test_grid_analytic/input_network_data.json"
 feeder_ids = [16]
@@ -35,3 +38,53 @@ def test_line_not_connected():
     with pytest.raises(LineNotFullyConnectedError) as error:
         result.alternative_grid_topology(edge_id=22)
     assert str(error.value) == "Line is not fully connected on both side."
+
+
+def test_no_alternative_grids():
+    df_result = result.alternative_grid_topology(edge_id=17)
+    assert df_result.empty
+    assert df_result.columns.to_list() == ["alternative_line_id", "loading_max", "loading_max_line_id", "timestamps"]
+
+
+def test_contingency_sweep():
+    df_sweep = result.contingency_sweep()
+    assert df_sweep["outage_line_id"].to_list() == [16, 18, 20, 22]
+    for line_id, df_line in df_sweep.groupby("outage_line_id"):
+        df_single = result.alternative_grid_topology(edge_id=line_id)
+        assert df_single.reset_index(drop=True).equals(df_line.drop(columns="outage_line_id").reset_index(drop=True))
+
+
+def test_contingency_sweep_multi_core():
+    result_multi_core = GridAnalysis(
+        data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids, threading=0, processes=2
+    )
+    assert result_multi_core.contingency_sweep().equals(result.contingency_sweep())
+    assert result_multi_core.optimal_tap_position() == result.optimal_tap_position()
+    result_multi_core.close()
+
+
+def test_contingency_sweep_screening(tmp_path):
+    paths = write_lv_grid(str(tmp_path), n_feeders=3, nodes_per_feeder=8, n_timestamps=24, n_open_points=4, seed=2)
+    with open(paths["meta_data"], encoding="utf-8") as file:
+        lv_feeders = json.load(file)["lv_feeders"]
+    analysis = GridAnalysis(
+        data=[paths["data"], paths["active_load_profile"], paths["reactive_load_profile"], paths["ev_pool"]],
+        feeder_ids=lv_feeders,
+    )
+    df_full = analysis.contingency_sweep()
+    df_screened = analysis.contingency_sweep(top_k=1)
+    assert df_screened.columns.to_list() == df_full.columns.to_list() + ["screened_out"]
+    calculated = df_screened[~df_screened["screened_out"]]
+    assert calculated["outage_line_id"].is_unique
+    assert set(calculated["outage_line_id"]) == set(df_full["outage_line_id"])
+    assert calculated.drop(columns="screened_out").equals(df_full.loc[calculated.index])
+    # the screened out rows hold the estimated loading
+    assert df_screened.loc[df_screened["screened_out"], "loading_max"].notna().all()
+    df_limit = analysis.contingency_sweep(max_loading=0.0, margin=0.0)
+    assert df_limit["screened_out"].all()
+
+
+def test_alternative_grids_screening():
+    df_result = result.alternative_grid_topology(edge_id=22, max_loading=1.0)
+    assert not df_result["screened_out"].any()
+    assert df_result.drop(columns="screened_out").equals(result.alternative_grid_topology(edge_id=22))
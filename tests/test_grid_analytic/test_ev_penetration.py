@@ -1,4 +1,13 @@
-from power_system_simulation.grid_analytic import GridAnalysis
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from power_system_simulation.grid_analytic import GridAnalysis, InvalidPenetrationLevelError
+from power_system_simulation.power_grid_modelling import PowerGridModelling
+from power_system_simulation.profile_loading import ProfileOverlay
+from power_system_simulation.profiling import Profiler
 
 data_path = "tests/test_grid_analytic/input_network_data.json"
 feeder_ids = [16, 20]
@@ -9,5 +18,89 @@ ev_path = "tests/test_grid_analytic/ev_active_power_profile.parquet"
 
 def test_EV_penetration_level():
     data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+    active_load_profile = data.active_load_profile.copy()
     data.ev_penetration_level(0.5)
-    assert True
+    # the EV profiles are overlaid, the active load profile of the grid is left unchanged
+    pd.testing.assert_frame_equal(data.active_load_profile, active_load_profile)
+    random.seed(1)
+    df_timestamp, df_line = data.ev_penetration_level(0)
+    random.seed(1)
+    df_timestamp_repeat, df_line_repeat = data.ev_penetration_level(0)
+    pd.testing.assert_frame_equal(df_timestamp, df_timestamp_repeat)
+    pd.testing.assert_frame_equal(df_line, df_line_repeat)
+
+
+def test_EV_penetration_sparse_update():
+    data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+    sparse = GridAnalysis(
+        data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids, sparse_ev_update=True
+    )
+    pd.testing.assert_frame_equal(
+        sparse.ev_penetration_sweep(penetration_levels=[0, 0.5, 1], seed=3),
+        data.ev_penetration_sweep(penetration_levels=[0, 0.5, 1], seed=3),
+    )
+
+
+def test_EV_penetration_monte_carlo():
+    data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+    df_line, df_node = data.ev_penetration_monte_carlo(penetration_level=0.5, n_samples=10, seed=42)
+    assert df_line.columns.to_list() == ["Max_Loading_P5", "Max_Loading_P50", "Max_Loading_P95"]
+    assert df_node.columns.to_list() == ["Min_Voltage_P5", "Min_Voltage_P50", "Min_Voltage_P95"]
+    assert (df_line["Max_Loading_P5"] <= df_line["Max_Loading_P95"]).all()
+    assert (df_node["Min_Voltage_P5"] <= df_node["Min_Voltage_P95"]).all()
+    df_line_repeat, _ = data.ev_penetration_monte_carlo(penetration_level=0.5, n_samples=10, seed=42)
+    assert df_line.equals(df_line_repeat)
+
+
+def test_EV_penetration_monte_carlo_values():
+    data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+    # without EVs every sample is the base case
+    df_line, df_node = data.ev_penetration_monte_carlo(penetration_level=0, n_samples=3, seed=1)
+    base = PowerGridModelling(data.input_data, data.active_load_profile, data.reactive_load_profile)
+    for column in df_line.columns:
+        np.testing.assert_allclose(df_line[column], base.data_per_line().loc[df_line.index, "Max_Loading"])
+    for column in df_node.columns:
+        np.testing.assert_allclose(df_node[column], base.output_data["node"]["u_pu"].min(axis=0))
+    # with one sample every percentile is the maximum and minimum of that sample's EV assignment
+    df_line, df_node = data.ev_penetration_monte_carlo(penetration_level=0.5, n_samples=1, seed=4)
+    feeder_ranking, house_profiles = data._ev_ranking(n_samples=1, rng=np.random.default_rng(4))
+    columns = np.concatenate([ranking[0, : data._number_of_ev(0.5)] for ranking in feeder_ranking])
+    active_load_profile = ProfileOverlay(data.active_load_profile, data.ev_pool, columns, house_profiles[0, columns])
+    sample = PowerGridModelling(data.input_data, active_load_profile, data.reactive_load_profile)
+    for column in df_line.columns:
+        np.testing.assert_allclose(df_line[column], sample.data_per_line().loc[df_line.index, "Max_Loading"])
+    for column in df_node.columns:
+        np.testing.assert_allclose(df_node[column], sample.output_data["node"]["u_pu"].min(axis=0))
+
+
+def test_EV_penetration_level_too_high():
+    data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+    with pytest.raises(InvalidPenetrationLevelError) as error:
+        data.ev_penetration_monte_carlo(penetration_level=2, n_samples=1, seed=42)
+    assert str(error.value) == "Number of EVs per feeder exceeds the number of houses in the feeder."
+
+
+def test_EV_penetration_sweep():
+    data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+    df_result = data.ev_penetration_sweep(penetration_levels=[0, 0.5, 1], seed=3)
+    assert df_result.index.to_list() == [0, 0.5, 1]
+    assert df_result["Max_Loading"].is_monotonic_increasing
+    assert df_result["Min_Voltage"].is_monotonic_decreasing
+
+
+def test_hosting_capacity():
+    data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+    assert data.hosting_capacity(seed=3) == 1
+    assert data.hosting_capacity(max_loading=0.00168, seed=3) == 0.5
+    assert data.hosting_capacity(max_loading=0.001, seed=3) == 0
+
+
+def test_model_built_once():
+    with Profiler() as profiler:
+        data = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+        data.ev_penetration_level(0.5)
+        data.optimal_tap_position()
+        data.contingency_sweep()
+        data.ev_penetration_sweep(penetration_levels=[0, 0.5], seed=3)
+    phases = profiler.report()["phase"]
+    assert phases.str.endswith("model_construction").sum() == 1
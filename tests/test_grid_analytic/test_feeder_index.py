@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from power_system_simulation.grid_analytic import GridAnalysis, IDNotFoundError
+
+data_path = "tests/test_grid_analytic/input_network_data.json"
+feeder_ids = [16, 20]
+active_path = "tests/test_grid_analytic/active_power_profile.parquet"
+reactive_path = "tests/test_grid_analytic/reactive_power_profile.parquet"
+ev_path = "tests/test_grid_analytic/ev_active_power_profile.parquet"
+result = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+
+
+def test_node_feeder_ids():
+    assert result.node_feeder_ids.tolist() == [-1, -1, 16, 16, 16, 16, 20, 20, 20, 20]
+    assert result.feeder_of_node(node_id=1) == -1
+    assert result.feeder_of_node(node_id=7) == 20
+
+
+def test_load_feeder_ids():
+    assert result.load_feeder_ids.tolist() == [16, 16, 20, 20]
+    assert result.feeder_of_sym_load(sym_load_id=13) == 16
+    assert np.array_equal(result.feeder_load_ids[20], [14, 15])
+
+
+def test_feeder_of_unknown_id():
+    with pytest.raises(IDNotFoundError) as error:
+        result.feeder_of_node(node_id=99)
+    assert str(error.value) == "Node ID provided is not in node IDs."
+    with pytest.raises(IDNotFoundError) as error:
+        result.feeder_of_sym_load(sym_load_id=3)
+    assert str(error.value) == "Sym load ID provided is not in sym load IDs."
@@ -0,0 +1,125 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from power_system_simulation import fleet as fleet_module
+from power_system_simulation.fleet import (
+    InvalidManifestError,
+    InvalidStudyError,
+    discover_grids,
+    read_manifest,
+    run_fleet,
+    write_partitions,
+)
+from power_system_simulation.grid_analytic import GridAnalysis
+from power_system_simulation.grid_generator import write_lv_grid
+
+studies = {"optimal_tap_position": {}, "ev_penetration_sweep": {"penetration_levels": [0, 0.5], "seed": 1}}
+
+
+def fleet(directory):
+    for seed in range(2):
+        write_lv_grid(directory=str(directory / f"grid_{seed}"), n_feeders=2, nodes_per_feeder=4, seed=seed)
+    # a grid whose meta data names a feeder which does not exist
+    paths = write_lv_grid(directory=str(directory / "grid_bad"), n_feeders=2, nodes_per_feeder=4, seed=5)
+    with open(paths["meta_data"], "w", encoding="utf-8") as file:
+        json.dump({"lv_feeders": [9999]}, file)
+
+
+def test_run_fleet(tmp_path):
+    fleet(tmp_path / "grids")
+    progress = []
+    status = run_fleet(
+        str(tmp_path / "grids"),
+        studies,
+        str(tmp_path / "output"),
+        processes=2,
+        progress=lambda record, done, total: progress.append((record["grid_id"], done, total)),
+    )
+    assert status["grid_id"].tolist() == ["grid_0", "grid_1", "grid_bad"]
+    assert status["status"].tolist() == ["ok", "ok", "failed"]
+    assert "InvalidFeederError" in status["error"][2]
+    assert sorted(done for _, done, _ in progress) == [1, 2, 3]
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "output" / "fleet_status.parquet"), status)
+    tap = pd.read_parquet(tmp_path / "output" / "optimal_tap_position")
+    assert sorted(tap["grid_id"].astype(str)) == ["grid_0", "grid_1"]
+    sweep = pd.read_parquet(tmp_path / "output" / "ev_penetration_sweep", filters=[("grid_id", "=", "grid_1")])
+    paths = discover_grids(str(tmp_path / "grids"))["grid_1"]
+    with open(paths["meta_data"], encoding="utf-8") as file:
+        feeder_ids = json.load(file)["lv_feeders"]
+    analysis = GridAnalysis(
+        data=[paths["data"], paths["active_load_profile"], paths["reactive_load_profile"], paths["ev_pool"]],
+        feeder_ids=feeder_ids,
+    )
+    expected = analysis.ev_penetration_sweep(penetration_levels=[0, 0.5], seed=1).reset_index()
+    pd.testing.assert_frame_equal(sweep.drop(columns="grid_id"), expected)
+
+
+def test_fleet_manifest(tmp_path):
+    fleet(tmp_path)
+    manifest = tmp_path / "manifest.json"
+    with open(manifest, "w", encoding="utf-8") as file:
+        json.dump([{"directory": "grid_1", "grid_id": "north"}, {"directory": "grid_0"}], file)
+    assert list(read_manifest(str(manifest))) == ["north", "grid_0"]
+    status = run_fleet(str(manifest), {"optimal_tap_position": {}}, str(tmp_path / "output"))
+    assert status["status"].tolist() == ["ok", "ok"]
+    with open(manifest, "w", encoding="utf-8") as file:
+        json.dump([{"directory": "grid_1"}, {"directory": "grid_1"}], file)
+    with pytest.raises(InvalidManifestError) as error:
+        read_manifest(str(manifest))
+    assert str(error.value) == "Grid IDs in the manifest should be unique."
+    with pytest.raises(InvalidStudyError):
+        run_fleet(str(tmp_path), {"power_flow": {}}, str(tmp_path / "output"))
+    with open(manifest, "w", encoding="utf-8") as file:
+        json.dump([{"directory": "grid_1", "grid_id": "north/grid_id=1"}], file)
+    with pytest.raises(InvalidManifestError):
+        read_manifest(str(manifest))
+
+
+def test_fleet_rerun(tmp_path):
+    fleet(tmp_path / "grids")
+    output = str(tmp_path / "output")
+    run_fleet(str(tmp_path / "grids"), {"optimal_tap_position": {}}, output)
+    # a grid which fails on a rerun keeps no results of the earlier run
+    paths = discover_grids(str(tmp_path / "grids"))["grid_1"]
+    with open(paths["meta_data"], "w", encoding="utf-8") as file:
+        json.dump({"lv_feeders": [9999]}, file)
+    status = run_fleet(str(tmp_path / "grids"), {"optimal_tap_position": {}}, output)
+    assert status["status"].tolist() == ["ok", "failed", "failed"]
+    tap = pd.read_parquet(tmp_path / "output" / "optimal_tap_position")
+    assert tap["grid_id"].astype(str).tolist() == ["grid_0"]
+
+
+def test_fleet_worker_died(tmp_path, monkeypatch):
+    fleet(tmp_path / "grids")
+    output = str(tmp_path / "output")
+    run_fleet(str(tmp_path / "grids"), {"optimal_tap_position": {}}, output)
+    run_grid = fleet_module.run_grid
+
+    def dying_run_grid(grid_id, *arguments):
+        if grid_id == "grid_0":
+            # the worker process is killed without a chance to report, like out of memory
+            os._exit(1)
+        return run_grid(grid_id, *arguments)
+
+    # the forked worker processes inherit the patched function
+    monkeypatch.setattr(fleet_module, "run_grid", dying_run_grid)
+    status = run_fleet(str(tmp_path / "grids"), {"optimal_tap_position": {}}, output, processes=2)
+    assert status["status"].tolist() == ["failed", "ok", "failed"]
+    assert "BrokenProcessPool" in status["error"][0]
+    tap = pd.read_parquet(tmp_path / "output" / "optimal_tap_position")
+    assert tap["grid_id"].astype(str).tolist() == ["grid_1"]
+
+
+def test_write_partitions(tmp_path):
+    table = pd.DataFrame({"value": [1, 2]})
+    write_partitions(str(tmp_path), "grid_0", {"first": table, "second": table})
+    # the second table cannot be written, so neither table of the rerun is moved into place
+    with pytest.raises(Exception):
+        write_partitions(str(tmp_path), "grid_0", {"first": table * 2, "second": pd.DataFrame({"value": [1, "a"]})})
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "first" / "grid_id=grid_0"), table)
+    write_partitions(str(tmp_path), "grid_0", {"first": table * 2})
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "first" / "grid_id=grid_0"), table * 2)
+    assert not list((tmp_path / ".staging").iterdir())
@@ -10,6 +10,8 @@ from power_system_simulation.grid_analytic import (
     InvalidNumberOfTransformerError,
     InvalidProfilesError,
 )
+from power_system_simulation.power_grid_modelling import InvalidChunkSizeError
+from power_system_simulation.profile_loading import InvalidProfilesError as ProfileValuesError
 
 data_path = "tests/test_grid_analytic/input_network_data.json"
 feeder_ids = [16, 20]
@@ -91,6 +93,28 @@ def test_matching_time_stamps_ev():
     assert str(error.value) == "EV pool and load profiles should have matching timestamps."
 
 
+def test_ev_pool_not_finite():
+    new_data = pd.read_parquet(ev_path)
+    new_data.iloc[5, :] = float("nan")
+    new_data.to_parquet(active_invalid_path)
+    # the EV profiles are only read, and checked, when they are sampled
+    data = GridAnalysis(data=[data_path, active_path, reactive_path, active_invalid_path], feeder_ids=feeder_ids)
+    with pytest.raises(InvalidProfilesError) as error:
+        data.ev_penetration_monte_carlo(penetration_level=0.5, n_samples=2, seed=1)
+    assert str(error.value) == "EV profiles should only contain finite values."
+    with pytest.raises(ProfileValuesError) as error:
+        data.ev_penetration_level(0.5)
+    assert str(error.value) == "EV profiles should only contain finite values."
+
+
+def test_invalid_scenario_chunk_size():
+    with pytest.raises(InvalidChunkSizeError) as error:
+        GridAnalysis(
+            data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids, scenario_chunk_size=0
+        )
+    assert str(error.value) == "Scenario chunk size should be at least 1."
+
+
 # test input data as dict and dataframes
 # def test_input_data():
 #     with open(data_path) as fp:
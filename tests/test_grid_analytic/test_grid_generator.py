@@ -0,0 +1,32 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from power_system_simulation.grid_analytic import GridAnalysis
+from power_system_simulation.grid_generator import generate_lv_grid, write_lv_grid
+
+
+def test_generate_lv_grid():
+    dataset, meta_data = generate_lv_grid(n_feeders=3, nodes_per_feeder=5, n_open_points=2, seed=1)
+    assert len(dataset["node"]) == 17
+    assert len(dataset["line"]) == 3 * 5 + 2 + 2
+    assert np.sum(dataset["line"]["to_status"] == 0) == 4
+    assert len(meta_data["lv_feeders"]) == 3
+    dataset_repeat, _ = generate_lv_grid(n_feeders=3, nodes_per_feeder=5, n_open_points=2, seed=1)
+    assert np.array_equal(dataset["line"], dataset_repeat["line"])
+
+
+def test_write_lv_grid(tmp_path):
+    paths = write_lv_grid(directory=str(tmp_path), n_feeders=3, nodes_per_feeder=5, n_timestamps=200, seed=2)
+    with open(paths["meta_data"], encoding="utf-8") as file:
+        meta_data = json.load(file)
+    active_load_profile = pd.read_parquet(paths["active_load_profile"])
+    ev_pool = pd.read_parquet(paths["ev_pool"])
+    assert active_load_profile.shape[0] == 200
+    assert ev_pool.index.equals(active_load_profile.index)
+    result = GridAnalysis(
+        data=[paths["data"], paths["active_load_profile"], paths["reactive_load_profile"], paths["ev_pool"]],
+        feeder_ids=meta_data["lv_feeders"],
+    )
+    assert not result.contingency_sweep().empty
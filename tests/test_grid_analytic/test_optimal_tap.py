@@ -0,0 +1,24 @@
+import pytest
+
+from power_system_simulation.grid_analytic import GridAnalysis, InvalidCriterionError
+
+data_path = "tests/test_grid_analytic/input_network_data.json"
+feeder_ids = [16, 20]
+active_path = "tests/test_grid_analytic/active_power_profile.parquet"
+reactive_path = "tests/test_grid_analytic/reactive_power_profile.parquet"
+ev_path = "tests/test_grid_analytic/ev_active_power_profile.parquet"
+result = GridAnalysis(data=[data_path, active_path, reactive_path, ev_path], feeder_ids=feeder_ids)
+
+
+def test_optimal_tap_energy_loss():
+    assert result.optimal_tap_position(criterion="energy_loss") == 5
+
+
+def test_optimal_tap_voltage_deviation():
+    assert result.optimal_tap_position(criterion="voltage_deviation") == 1
+
+
+def test_invalid_criterion():
+    with pytest.raises(InvalidCriterionError) as error:
+        result.optimal_tap_position(criterion="loading")
+    assert str(error.value) == "Criterion should be either energy_loss or voltage_deviation."
@@ -2,8 +2,22 @@ import warnings
 
 import numpy as np
 import pytest
+from power_grid_model import initialize_array
+from power_grid_model.utils import json_deserialize_from_file
 
-from power_system_simulation.power_grid_modelling import InvalidProfilesError, PowerGridModelling
+from power_system_simulation import power_grid_modelling
+from power_system_simulation.grid_generator import generate_lv_grid, generate_profiles
+from power_system_simulation.power_grid_modelling import (
+    InvalidCalculationMethodError,
+    InvalidChunkSizeError,
+    InvalidProfilesError,
+    PowerGridModelling,
+    ShardPool,
+    batch_rows,
+    calculate_batch,
+    sparse_batch,
+)
+from power_system_simulation.profiling import Profiler
 
 with warnings.catch_warnings(action="ignore", category=DeprecationWarning):
     # suppress warning about pyarrow as future required dependency
@@ -52,4 +66,194 @@ def test_table2():
         reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
     )
     result = output.data_per_line()
-    assert True
+    expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_line.parquet")
+    pd.testing.assert_frame_equal(result, expected_result)
+
+
+def test_chunked_tables():
+    output = PowerGridModelling(
+        data_path="tests/test_power_grid_model/input_network_data.json",
+        active_load_profile_path="tests/test_power_grid_model/active_power_profile.parquet",
+        reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
+        chunk_size=3,
+    )
+    assert output.output_data is None
+    # no decoded profile values are kept after the run
+    assert output.active_load_profile.decoded is None and output.reactive_load_profile.decoded is None
+    expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_timestamp.parquet")
+    pd.testing.assert_frame_equal(output.data_per_timestamp(), expected_result)
+    expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_line.parquet")
+    pd.testing.assert_frame_equal(output.data_per_line(), expected_result)
+
+
+def test_multi_core_tables():
+    output = PowerGridModelling(
+        data_path="tests/test_power_grid_model/input_network_data.json",
+        active_load_profile_path="tests/test_power_grid_model/active_power_profile.parquet",
+        reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
+        threading=0,
+        processes=2,
+    )
+    expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_timestamp.parquet")
+    pd.testing.assert_frame_equal(output.data_per_timestamp(), expected_result)
+    expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_line.parquet")
+    pd.testing.assert_frame_equal(output.data_per_line(), expected_result)
+
+
+def test_calculation_methods():
+    for calculation_method in ["iterative_current", "auto"]:
+        output = PowerGridModelling(
+            data_path="tests/test_power_grid_model/input_network_data.json",
+            active_load_profile_path="tests/test_power_grid_model/active_power_profile.parquet",
+            reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
+            calculation_method=calculation_method,
+        )
+        expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_timestamp.parquet")
+        pd.testing.assert_frame_equal(output.data_per_timestamp(), expected_result, rtol=1e-3)
+        expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_line.parquet")
+        pd.testing.assert_frame_equal(output.data_per_line(), expected_result, rtol=1e-2)
+
+
+def test_auto_calculation_method():
+    dataset, _ = generate_lv_grid(n_feeders=2, nodes_per_feeder=20, seed=4)
+    active_load_profile, reactive_load_profile, _ = generate_profiles(dataset["sym_load"]["id"], 48, seed=4)
+    update = initialize_array("update", "sym_load", active_load_profile.shape)
+    update["id"] = active_load_profile.columns.to_numpy()
+    update["p_specified"] = active_load_profile.to_numpy() * 2
+    update["q_specified"] = reactive_load_profile.to_numpy() * 2
+    update_data = {"sym_load": update}
+    exact = calculate_batch(dataset, update_data, ["node"])
+    with Profiler() as profiler:
+        auto = calculate_batch(dataset, update_data, ["node"], calculation_method="auto", auto_max_iterations=4)
+    resolved = profiler.records[0]["resolved_scenarios"]
+    # the heavily loaded scenarios do not converge within the limit of the fast pass
+    assert 0 < resolved < len(update)
+    assert list(auto) == ["node"]
+    np.testing.assert_allclose(auto["node"]["u_pu"], exact["node"]["u_pu"], atol=1e-6)
+    with Profiler() as profiler:
+        sharded = calculate_batch(
+            dataset, update_data, ["node"], calculation_method="auto", auto_max_iterations=4, processes=2
+        )
+    assert profiler.records[0]["resolved_scenarios"] == resolved
+    np.testing.assert_array_equal(sharded["node"], auto["node"])
+
+
+def test_shard_pool():
+    dataset, _ = generate_lv_grid(n_feeders=2, nodes_per_feeder=10, seed=5)
+    active_load_profile, reactive_load_profile, _ = generate_profiles(dataset["sym_load"]["id"], 24, seed=5)
+    update = initialize_array("update", "sym_load", active_load_profile.shape)
+    update["id"] = active_load_profile.columns.to_numpy()
+    update["p_specified"] = active_load_profile.to_numpy()
+    update["q_specified"] = reactive_load_profile.to_numpy()
+    expected_result = calculate_batch(dataset, {"sym_load": update}, ["node"])
+    with ShardPool(dataset, 2) as pool:
+        first = calculate_batch(dataset, {"sym_load": update}, ["node"], threading=0, processes=2, pool=pool)
+        workers = set(pool.executor._processes)
+        second = calculate_batch(dataset, {"sym_load": update[:5]}, ["node"], threading=0, processes=2, pool=pool)
+        # the workers and their models are kept across calculations
+        assert set(pool.executor._processes) == workers
+    np.testing.assert_array_equal(first["node"], expected_result["node"])
+    np.testing.assert_array_equal(second["node"], expected_result["node"][:5])
+
+
+def test_shard_pool_closed_on_error(monkeypatch):
+    pools = []
+
+    class RecordedShardPool(ShardPool):
+        def __init__(self, input_data, processes):
+            super().__init__(input_data, processes)
+            pools.append(self)
+
+    monkeypatch.setattr(power_grid_modelling, "ShardPool", RecordedShardPool)
+    with pytest.raises(InvalidCalculationMethodError):
+        PowerGridModelling(
+            data_path="tests/test_power_grid_model/input_network_data.json",
+            active_load_profile_path="tests/test_power_grid_model/active_power_profile.parquet",
+            reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
+            processes=2,
+            calculation_method="iterative_linear",
+        )
+    assert len(pools) == 1 and not pools[0]._finalizer.alive
+
+
+def test_invalid_chunk_size():
+    for chunk_size in [0, -2]:
+        with pytest.raises(InvalidChunkSizeError) as error:
+            PowerGridModelling(
+                data_path="tests/test_power_grid_model/input_network_data.json",
+                active_load_profile_path="tests/test_power_grid_model/active_power_profile.parquet",
+                reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
+                chunk_size=chunk_size,
+            )
+        assert str(error.value) == "Chunk size should be at least 1."
+
+
+def test_empty_profiles():
+    active_load_profile = pd.read_parquet("tests/test_power_grid_model/active_power_profile.parquet")
+    reactive_load_profile = pd.read_parquet("tests/test_power_grid_model/reactive_power_profile.parquet")
+    with pytest.raises(InvalidProfilesError) as error:
+        PowerGridModelling(
+            data_path="tests/test_power_grid_model/input_network_data.json",
+            active_load_profile_path=active_load_profile.iloc[:0],
+            reactive_load_profile_path=reactive_load_profile.iloc[:0],
+        )
+    assert str(error.value) == "Load profiles should contain at least one timestamp."
+
+
+def test_invalid_calculation_method():
+    with pytest.raises(InvalidCalculationMethodError) as error:
+        PowerGridModelling(
+            data_path="tests/test_power_grid_model/input_network_data.json",
+            active_load_profile_path="tests/test_power_grid_model/active_power_profile.parquet",
+            reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
+            calculation_method="iterative_linear",
+        )
+    assert str(error.value) == (
+        "Calculation method should be one of linear, linear_current, iterative_current, newton_raphson, auto."
+    )
+
+
+def test_output_attributes():
+    output = PowerGridModelling(
+        data_path="tests/test_power_grid_model/input_network_data.json",
+        active_load_profile_path="tests/test_power_grid_model/active_power_profile.parquet",
+        reactive_load_profile_path="tests/test_power_grid_model/reactive_power_profile.parquet",
+        output_dtype="float32",
+    )
+    assert output.output_data["node"].dtype.names == ("id", "u_pu")
+    assert output.output_data["line"].dtype["loading"] == np.float32
+    expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_timestamp.parquet")
+    pd.testing.assert_frame_equal(output.data_per_timestamp(), expected_result, check_dtype=False, rtol=1e-6)
+    expected_result = pd.read_parquet("tests/test_power_grid_model/output_table_row_per_line.parquet")
+    pd.testing.assert_frame_equal(output.data_per_line(), expected_result, check_dtype=False, rtol=1e-5)
+    update = initialize_array("update", "sym_load", (2, 1))
+    update["id"] = 10
+    update["p_specified"] = [[1e5], [2e5]]
+    update["q_specified"] = 0
+    dataset = json_deserialize_from_file("tests/test_power_grid_model/input_network_data.json")
+    full = calculate_batch(dataset, {"sym_load": update}, ["line"])
+    compact = calculate_batch(dataset, {"sym_load": update}, {"line": ["loading"]}, processes=2)
+    assert compact["line"].dtype.names == ("id", "loading")
+    np.testing.assert_array_equal(compact["line"]["loading"], full["line"]["loading"])
+
+
+def test_sparse_batch():
+    dataset, _ = generate_lv_grid(n_feeders=2, nodes_per_feeder=10, seed=6)
+    active_load_profile, reactive_load_profile, _ = generate_profiles(dataset["sym_load"]["id"], 12, seed=6)
+    update = initialize_array("update", "sym_load", active_load_profile.shape)
+    update["id"] = active_load_profile.columns.to_numpy()
+    update["p_specified"] = active_load_profile.to_numpy()
+    update["q_specified"] = reactive_load_profile.to_numpy()
+    # loads left out of the sparse batch keep their input data
+    changed = np.random.default_rng(6).random(update.shape) < 0.3
+    update["p_specified"][~changed] = dataset["sym_load"]["p_specified"][np.newaxis].repeat(len(update), 0)[~changed]
+    update["q_specified"][~changed] = dataset["sym_load"]["q_specified"][np.newaxis].repeat(len(update), 0)[~changed]
+    sparse = sparse_batch(update, changed)
+    assert len(sparse["data"]) == changed.sum()
+    dense_output = calculate_batch(dataset, {"sym_load": update}, {"node": ["u_pu"]})
+    sparse_output = calculate_batch(dataset, {"sym_load": sparse}, {"node": ["u_pu"]}, processes=2)
+    np.testing.assert_allclose(sparse_output["node"]["u_pu"], dense_output["node"]["u_pu"])
+    rows = np.array([7, 2, 3])
+    np.testing.assert_array_equal(
+        batch_rows({"sym_load": sparse}, rows)["sym_load"]["data"], update[rows][changed[rows]]
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from power_system_simulation.profile_loading import ProfileOverlay, ProfileTable
+
+active_path = "tests/test_power_grid_model/active_power_profile.parquet"
+ev_path = "tests/test_grid_analytic/ev_active_power_profile.parquet"
+
+
+def test_profile_table():
+    expected_result = pd.read_parquet(active_path)
+    profile = ProfileTable(active_path)
+    assert profile.index.equals(expected_result.index)
+    assert profile.columns.equals(expected_result.columns)
+    assert profile.shape == expected_result.shape
+    assert profile.to_pandas().equals(expected_result)
+
+
+def test_profile_table_projection():
+    expected_result = pd.read_parquet(ev_path)
+    profile = ProfileTable(ev_path)
+    values = profile.read(columns=[3, 1], rows=slice(10, 20))
+    assert np.array_equal(values, expected_result.iloc[10:20, [3, 1]].to_numpy())
+
+
+def test_profile_overlay():
+    base = pd.read_parquet("tests/test_grid_analytic/active_power_profile.parquet")
+    pool = pd.read_parquet(ev_path)
+    original = base.copy()
+    overlay = ProfileOverlay(base, ProfileTable(ev_path), columns=[2, 0], pool_columns=[3, 1])
+    expected_result = base.copy()
+    expected_result.iloc[:, 2] += pool.iloc[:, 3]
+    expected_result.iloc[:, 0] += pool.iloc[:, 1]
+    assert overlay.shape == base.shape
+    pd.testing.assert_frame_equal(overlay.to_pandas(), expected_result)
+    values = np.empty((10, base.shape[1]))
+    overlay.fill(values, rows=slice(10, 20))
+    assert np.array_equal(values, expected_result.iloc[10:20].to_numpy())
+    pd.testing.assert_frame_equal(base, original)
+
+
+def test_profile_table_row_groups(tmp_path):
+    expected_result = pd.read_parquet("tests/test_grid_analytic/active_power_profile.parquet").iloc[:96]
+    path = str(tmp_path / "profile.parquet")
+    expected_result.to_parquet(path, row_group_size=24)
+    profile = ProfileTable(path)
+    read_rows = []
+    read_row_group = profile.file.read_row_group
+
+    def counting_read_row_group(group, columns):
+        table = read_row_group(group, columns=columns)
+        read_rows.append(table.num_rows)
+        return table
+
+    profile.file.read_row_group = counting_read_row_group
+    # a chunk inside one row group only reads that row group
+    assert np.array_equal(profile.read(rows=slice(30, 40)), expected_result.iloc[30:40].to_numpy())
+    assert read_rows == [24]
+    # consecutive chunks decode every row group once
+    read_rows.clear()
+    values = np.empty(expected_result.shape)
+    for start in range(0, 96, 10):
+        profile.fill(values[start : start + 10], rows=slice(start, start + 10))
+    assert np.array_equal(values, expected_result.to_numpy())
+    assert read_rows == [24, 24, 24, 24]
+    assert profile.decoded is None
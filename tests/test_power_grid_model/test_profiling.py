@@ -0,0 +1,48 @@
+from power_system_simulation.grid_analytic import GridAnalysis
+from power_system_simulation.power_grid_modelling import PowerGridModelling
+from power_system_simulation.profiling import Profiler, phase
+
+data_path = "tests/test_power_grid_model/input_network_data.json"
+active_path = "tests/test_power_grid_model/active_power_profile.parquet"
+reactive_path = "tests/test_power_grid_model/reactive_power_profile.parquet"
+grid_path = "tests/test_grid_analytic/input_network_data.json"
+grid_active_path = "tests/test_grid_analytic/active_power_profile.parquet"
+grid_reactive_path = "tests/test_grid_analytic/reactive_power_profile.parquet"
+ev_path = "tests/test_grid_analytic/ev_active_power_profile.parquet"
+
+
+def test_power_grid_modelling_phases():
+    with Profiler(memory=True) as profiler:
+        result = PowerGridModelling(data_path, active_path, reactive_path, chunk_size=500)
+        result.data_per_line()
+    report = profiler.report()
+    assert report["phase"].iloc[0] == "PowerGridModelling"
+    assert report["depth"].iloc[0] == 0
+    batches = report[report["phase"] == "PowerGridModelling/calculate_batch"]
+    assert batches["batch_size"].sum() == len(result.timestamps)
+    assert (batches["calculation_method"] == "newton_raphson").all()
+    assert {"PowerGridModelling/deserialize", "PowerGridModelling/aggregation"}.issubset(set(report["phase"]))
+    assert (report["seconds"] >= 0).all()
+    # the peak of a phase includes the peaks of its nested phases
+    assert report["peak_memory_bytes"].iloc[0] >= batches["peak_memory_bytes"].max()
+    summary = profiler.summary()
+    assert summary.loc["PowerGridModelling/calculate_batch", "calls"] == len(batches)
+
+
+def test_grid_analysis_phases():
+    with Profiler() as profiler:
+        analysis = GridAnalysis(data=[grid_path, grid_active_path, grid_reactive_path, ev_path], feeder_ids=[16, 20])
+        analysis.optimal_tap_position()
+    phases = set(profiler.report()["phase"])
+    assert "GridAnalysis/graph_creator" in phases
+    assert "GridAnalysis.optimal_tap_position/calculate_batch" in phases
+    assert "peak_memory_bytes" not in profiler.report()
+
+
+def test_disabled_profiler():
+    with Profiler() as profiler:
+        pass
+    with phase("outside", batch_size=1):
+        pass
+    assert not profiler.records
+    assert profiler.summary().empty
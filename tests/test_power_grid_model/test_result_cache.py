@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from power_system_simulation.power_grid_modelling import PowerGridModelling
+from power_system_simulation.result_cache import ResultCache
+
+data_path = "tests/test_power_grid_model/input_network_data.json"
+active_path = "tests/test_power_grid_model/active_power_profile.parquet"
+reactive_path = "tests/test_power_grid_model/reactive_power_profile.parquet"
+
+
+def test_cached_tables(tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    output = PowerGridModelling(data_path, active_path, reactive_path, cache=cache)
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+    output_cached = PowerGridModelling(data_path, active_path, reactive_path, cache=cache)
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+    pd.testing.assert_frame_equal(output.data_per_timestamp(), output_cached.data_per_timestamp())
+    pd.testing.assert_frame_equal(output.data_per_line(), output_cached.data_per_line())
+
+
+def test_cache_eviction(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_bytes=2000)
+    for key in ["a", "b", "c"]:
+        cache.put(key, {"line": np.zeros(100)})
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert np.array_equal(cache.get("c")["line"], np.zeros(100))
+    cache.clear()
+    assert cache.get("c") is None
+
+
+def write_repeatedly(directory: str, value: float) -> None:
+    cache = ResultCache(directory=directory, max_bytes=5000)
+    for index in range(50):
+        cache.put("shared", {"line": np.full(100, value)})
+        cache.put(f"{value}-{index}", {"line": np.zeros(100)})
+
+
+def test_cache_concurrent_writers(tmp_path):
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(write_repeatedly, str(tmp_path), value) for value in [1.0, 2.0]]
+        for future in futures:
+            future.result()
+    assert not list(tmp_path.glob("*.tmp"))
+    cache = ResultCache(directory=str(tmp_path))
+    assert cache.get("shared")["line"][0] in (1.0, 2.0)
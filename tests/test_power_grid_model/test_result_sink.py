@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from power_system_simulation.grid_analytic import GridAnalysis
+from power_system_simulation.power_grid_modelling import PowerGridModelling
+from power_system_simulation.result_sink import ParquetSink
+
+data_path = "tests/test_power_grid_model/input_network_data.json"
+active_path = "tests/test_power_grid_model/active_power_profile.parquet"
+reactive_path = "tests/test_power_grid_model/reactive_power_profile.parquet"
+grid_data = [
+    "tests/test_grid_analytic/input_network_data.json",
+    "tests/test_grid_analytic/active_power_profile.parquet",
+    "tests/test_grid_analytic/reactive_power_profile.parquet",
+    "tests/test_grid_analytic/ev_active_power_profile.parquet",
+]
+
+
+def test_power_grid_modelling_sink(tmp_path):
+    sink = ParquetSink(str(tmp_path), raw_output=True)
+    result = PowerGridModelling(data_path, active_path, reactive_path, chunk_size=4, sink=sink)
+    df_timestamp = pd.read_parquet(tmp_path / "data_per_timestamp").sort_values("Timestamp")
+    assert df_timestamp["date"].astype(str).unique().tolist() == ["2024-01-01"]
+    pd.testing.assert_frame_equal(
+        df_timestamp.drop(columns="date").set_index("Timestamp"), result.data_per_timestamp(), check_index_type=False
+    )
+    df_line = pd.read_parquet(tmp_path / "data_per_line").set_index("Line_ID")
+    pd.testing.assert_frame_equal(df_line, result.data_per_line())
+    node_output = pd.read_parquet(tmp_path / "output_node")
+    assert len(node_output) == len(result.timestamps) * 4
+    assert {"id", "u_pu", "Timestamp"}.issubset(node_output.columns)
+
+
+def test_grid_analysis_sink(tmp_path):
+    analysis = GridAnalysis(data=grid_data, feeder_ids=[16, 20])
+    sink = ParquetSink(str(tmp_path), raw_output=True)
+    chunked = GridAnalysis(data=grid_data, feeder_ids=[16, 20], sink=sink, scenario_chunk_size=2)
+    assert chunked.optimal_tap_position() == analysis.optimal_tap_position()
+    pd.testing.assert_frame_equal(chunked.contingency_sweep(), analysis.contingency_sweep())
+    pd.testing.assert_frame_equal(
+        chunked.ev_penetration_sweep([0, 0.5, 1], seed=3), analysis.ev_penetration_sweep([0, 0.5, 1], seed=3)
+    )
+    scores = pd.read_parquet(tmp_path / "optimal_tap_position")
+    assert np.array_equal(scores["tap_pos"], [1, 2, 3, 4, 5])
+    # raw output partitioned by scenario and date
+    line_output = pd.read_parquet(tmp_path / "optimal_tap_position_line", filters=[("tap_pos", "=", 2)])
+    assert len(line_output) == len(analysis.active_load_profile.index) * len(analysis.input_data["line"])
+    assert line_output["date"].nunique() == 10
+    sweep = pd.read_parquet(tmp_path / "contingency_sweep")
+    assert len(sweep) == len(analysis.contingency_sweep())
+    assert set(pd.read_parquet(tmp_path / "ev_penetration_sweep_node")["number_of_ev"].astype(int)) == {0, 1, 2}
+    chunked.ev_penetration_level(penetration_level=0)
+    df_line = pd.read_parquet(tmp_path / "ev_penetration_level_data_per_line")
+    assert df_line["penetration_level"].astype(int).unique().tolist() == [0]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from power_system_simulation.grid_analytic import GridAnalysis, ev_pool_mean
+from power_system_simulation.grid_generator import generate_profiles
+from power_system_simulation.power_grid_modelling import PowerGridModelling
+from power_system_simulation.timestamp_reduction import (
+    InvalidRepresentativesError,
+    TimestampReduction,
+    trapezoid_weights,
+)
+
+data_path = "tests/test_power_grid_model/input_network_data.json"
+active_path = "tests/test_power_grid_model/active_power_profile.parquet"
+reactive_path = "tests/test_power_grid_model/reactive_power_profile.parquet"
+grid_data = [
+    "tests/test_grid_analytic/input_network_data.json",
+    "tests/test_grid_analytic/active_power_profile.parquet",
+    "tests/test_grid_analytic/reactive_power_profile.parquet",
+    "tests/test_grid_analytic/ev_active_power_profile.parquet",
+]
+
+
+def test_timestamp_reduction():
+    active_load_profile, reactive_load_profile, _ = generate_profiles(np.arange(20), 96 * 7, seed=2)
+    snapshots = np.hstack([active_load_profile.to_numpy(), reactive_load_profile.to_numpy()])
+    reduction = TimestampReduction(snapshots, 50, seed=1)
+    assert len(reduction.representatives) == 50
+    assert np.all(np.diff(reduction.representatives) > 0)
+    assert reduction.weights.sum() == len(snapshots)
+    # every representative stands for itself
+    assert np.array_equal(reduction.assignment[reduction.representatives], np.arange(50))
+    assert 0 < reduction.rms_error < 1
+    timestamps = active_load_profile.index
+    total = snapshots.sum(axis=1)
+    np.testing.assert_allclose(
+        reduction.energy_weights(timestamps) @ total[reduction.representatives],
+        trapezoid_weights(timestamps) @ reduction.expand(total[reduction.representatives]),
+    )
+    full = TimestampReduction(snapshots, len(snapshots))
+    assert full.rms_error == 0 and full.max_error == 0 and full.peak_error == 0
+    with pytest.raises(InvalidRepresentativesError) as error:
+        TimestampReduction(snapshots, 0)
+    assert str(error.value) == "Number of representative timestamps should be at least 1."
+
+
+def test_power_grid_modelling_reduction():
+    output = PowerGridModelling(data_path, active_path, reactive_path, representatives=10)
+    assert output.reduction.rms_error == 0
+    pd.testing.assert_frame_equal(
+        output.data_per_timestamp(),
+        pd.read_parquet("tests/test_power_grid_model/output_table_row_per_timestamp.parquet"),
+    )
+    pd.testing.assert_frame_equal(
+        output.data_per_line(), pd.read_parquet("tests/test_power_grid_model/output_table_row_per_line.parquet")
+    )
+    reduced = PowerGridModelling(
+        data_path, active_path, reactive_path, representatives=4, reduction_seed=0, chunk_size=3
+    )
+    assert len(reduced.reduction.representatives) == 4
+    df_timestamp = reduced.data_per_timestamp()
+    assert df_timestamp.index.equals(output.timestamps)
+    # every timestamp gets the result of its representative
+    representatives = output.timestamps[reduced.reduction.representatives]
+    assigned = representatives[reduced.reduction.assignment]
+    np.testing.assert_array_equal(
+        df_timestamp["Max_Voltage"].to_numpy(), output.data_per_timestamp().loc[assigned, "Max_Voltage"].to_numpy()
+    )
+    assert set(reduced.data_per_line()["Max_Loading_Timestamp"]).issubset(set(representatives))
+
+
+def test_grid_analysis_reduction():
+    analysis = GridAnalysis(data=grid_data, feeder_ids=[16, 20])
+    np.testing.assert_allclose(ev_pool_mean(analysis.ev_pool), pd.read_parquet(grid_data[3]).to_numpy().mean(axis=1))
+    reduced = GridAnalysis(data=grid_data, feeder_ids=[16, 20], representatives=96, reduction_seed=0)
+    assert len(reduced.study_timestamps) == 96
+    assert reduced.reduction.rms_error < 0.5
+    assert reduced.optimal_tap_position() == analysis.optimal_tap_position()
+    df_sweep = reduced.contingency_sweep()
+    assert set(df_sweep["timestamps"]).issubset(set(reduced.study_timestamps))
+    np.testing.assert_allclose(df_sweep["loading_max"], analysis.contingency_sweep()["loading_max"], rtol=0.2, atol=0)
+    df_timestamp, df_line = reduced.ev_penetration_level(penetration_level=0)
+    assert df_timestamp.index.equals(analysis.active_load_profile.index)
+    assert set(df_line["Max_Loading_Timestamp"]).issubset(set(reduced.study_timestamps))
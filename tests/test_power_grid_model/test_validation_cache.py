@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+from power_grid_model.utils import json_deserialize_from_file
+from power_grid_model.validation import ValidationException
+
+from power_system_simulation import validation_cache
+from power_system_simulation.validation_cache import (
+    clear_validation_cache,
+    dataset_fingerprint,
+    validate_input_data,
+)
+
+data_path = "tests/test_power_grid_model/input_network_data.json"
+invalid_data_path = "tests/test_power_grid_model/input_network_data_invalid.json"
+
+
+def test_fingerprint():
+    dataset = json_deserialize_from_file(Path(data_path))
+    assert dataset_fingerprint(dataset) == dataset_fingerprint(json_deserialize_from_file(Path(data_path)))
+    dataset["line"]["r1"][0] += 1
+    assert dataset_fingerprint(dataset) != dataset_fingerprint(json_deserialize_from_file(Path(data_path)))
+
+
+def test_validation_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(validation_cache, "assert_valid_input_data", lambda **kwargs: calls.append(kwargs))
+    clear_validation_cache()
+    dataset = json_deserialize_from_file(Path(data_path))
+    validate_input_data(input_data=dataset)
+    validate_input_data(input_data=json_deserialize_from_file(Path(data_path)))
+    assert len(calls) == 1
+    clear_validation_cache()
+    validate_input_data(input_data=dataset)
+    assert len(calls) == 2
+
+
+def test_failed_validation_not_cached():
+    dataset = json_deserialize_from_file(Path(invalid_data_path))
+    for _ in range(2):
+        with pytest.raises(ValidationException):
+            validate_input_data(input_data=dataset)